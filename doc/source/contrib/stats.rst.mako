@@ -57,6 +57,21 @@ For example if *user-agent* http header of an healthcheck is set to some particu
 then you should at least set 'healtcheck' explicitely and the logger will avoid writing any log containing the word healthcheck.
 
 
+Cache warm-up
+-------------
+
+The logged requests can be used to fill the extract and response caches (see the ``cache`` section of the
+configuration) after a deployment or a data import. The following command requests the 100 extracts
+requested most often during the last 30 days from the running server:
+
+.. code-block:: shell
+
+    warm_up_cache -c production.ini -u https://oereb.example.com -n 100 -d 30
+
+The warm-up requests are sent with the user agent ``pyramid_oereb-warm-up``. Add it to the blacklist regex
+to keep them out of the statistics.
+
+
 Implementation
 --------------
 
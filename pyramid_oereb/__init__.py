@@ -56,6 +56,15 @@ def includeme(config):
         'pyramid_oereb': Config.get_config()
     })
 
+    # The pool settings have to be known before any connection is created
+    database_config = Config.get('database') or {}
+    database_adapter.configure(
+        database_config.get('pool'),
+        database_config.get('connections'),
+        database_config.get('replicas'),
+        database_config.get('replica_selection')
+    )
+
     config.add_renderer('pyramid_oereb_extract_json', 'pyramid_oereb.lib.renderer.extract.json_.Renderer')
     config.add_renderer('pyramid_oereb_extract_xml', 'pyramid_oereb.lib.renderer.extract.xml_.Renderer')
     config.add_renderer('pyramid_oereb_extract_print', Config.get('print').get('renderer'))
@@ -65,3 +74,19 @@ def includeme(config):
     config.add_renderer('pyramid_oereb_getegrid_xml', 'pyramid_oereb.lib.renderer.getegrid.xml_.Renderer')
 
     config.include('pyramid_oereb.routes')
+
+    # Readers and sources are shared between requests, their results are kept in a request context
+    from pyramid.events import NewRequest
+    from pyramid_oereb.lib.context import request_context_subscriber
+    from pyramid_oereb.lib.processor import processor_registry
+    config.add_subscriber(request_context_subscriber, NewRequest)
+    # One session per connection string is shared by all sources during a request
+    config.add_subscriber(database_adapter.request_subscriber, NewRequest)
+
+    # The processor is created on the first request, unless the connections are warmed up on startup
+    if database_config.get('warm_up'):
+        try:
+            processor_registry.get_processor()
+        except Exception:
+            log.exception('Creating the processor on startup failed, it is created on the first request')
+        database_adapter.warm_up()
@@ -3,6 +3,7 @@ import logging
 
 from pyramid_oereb import Config
 from pyramid_oereb.contrib.sources.document import OEREBlexSource
+from pyramid_oereb.lib.context import RequestScopedAttribute
 from pyramid_oereb.standard.sources.plr import DatabaseSource
 
 log = logging.getLogger(__name__)
@@ -14,6 +15,10 @@ class DatabaseOEREBlexSource(DatabaseSource):
     of standards documents. Be sure to use a model with an OEREBlex "lexlink" integer
     column for plrs that use this source.
     """
+
+    # Documents already fetched in the current request, stored by lexlink
+    _queried_lexlinks = RequestScopedAttribute('queried_lexlinks', dict)
+
     def __init__(self, **kwargs):
         """
         Keyword Arguments:
@@ -35,7 +40,6 @@ class DatabaseOEREBlexSource(DatabaseSource):
         """
         super(DatabaseOEREBlexSource, self).__init__(**kwargs)
         self._oereblex_source = OEREBlexSource(**Config.get_oereblex_config())
-        self._queried_lexlinks = {}
 
     def get_document_records(self, params, public_law_restriction_from_db):
         """
@@ -41,10 +41,18 @@ class OerebStats(dict):
     def __init__(self,
                  service=None,
                  output_format=None,
-                 params=None):
+                 params=None,
+                 degraded_topics=None,
+                 query_statistics=None):
         super(OerebStats, self).__init__(service=service,
                                          output_format=output_format,
                                          params=params)
+        # topics which were reported without data because they could not be read in time
+        if degraded_topics is not None:
+            super(OerebStats, self).__setitem__('degraded_topics', degraded_topics)
+        # number of statements, database time and rows per topic (see DatabaseAdapter.get_query_statistics)
+        if query_statistics:
+            super(OerebStats, self).__setitem__('query_statistics', query_statistics)
         self.itemlist = super(OerebStats, self).keys()
 
     def __setitem__(self, key, value):
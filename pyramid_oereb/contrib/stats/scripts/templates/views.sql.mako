@@ -65,6 +65,7 @@ CREATE OR REPLACE VIEW ${schema_name|u}.stats_get_extract_by_id AS
            cast(msg AS json) -> 'response' -> 'extras' -> 'params' ->> '__egrid__' AS egrid,
            cast(msg AS json) -> 'response' -> 'extras' -> 'params' ->> '__identdn__' AS identdn,
            cast(msg AS json) -> 'response' -> 'extras' -> 'params' ->> '__number__' AS number,
+           cast(msg AS json) -> 'response' -> 'extras' ->> 'degraded_topics' AS degraded_topics,
            created_at,
            cast(msg AS json) -> 'request' ->> 'path' AS path
     FROM ${schema_name|u}.${tablename|u} WHERE logger = 'JSON' AND cast(msg AS json) -> 'response' ->'extras' ->> 'service' = 'GetExtractById';
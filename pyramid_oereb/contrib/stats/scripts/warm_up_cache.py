@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import ast
+import configparser
+import json
+import logging
+import optparse
+
+from urllib.parse import urlencode
+
+from sqlalchemy import create_engine, text
+
+log = logging.getLogger(__name__)
+
+USER_AGENT = 'pyramid_oereb-warm-up'
+"""str: The user agent sent with the warm-up requests. Add it to the blacklist of the sqlalchemylogger
+handler to keep the warm-up requests out of the statistics."""
+
+
+def warm_up_cache():
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Requests the most requested extracts logged by the sqlalchemylogger to fill the extract '
+                    'and response caches, e.g. after a deployment or a data import.'
+    )
+    parser.add_option(
+        '-c', '--config',
+        dest='configfile',
+        metavar='INI_FILE',
+        type='string',
+        help='The same config .ini file used to initialize the sqlalchemylogger handler'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='config_section',
+        metavar='SECTION_NAME',
+        default='handler_sqlalchemylogger',
+        help='section in the ini-file. Default = "handler_sqlalchemylogger"'
+    )
+    parser.add_option(
+        '-a', '--args',
+        dest='config_sql_args',
+        metavar='SUBSECTION',
+        default='args',
+        help='subsection in the ini-file. Default = "args"'
+    )
+    parser.add_option(
+        '-n', '--number',
+        dest='number',
+        metavar='NUMBER',
+        type='int',
+        default=100,
+        help='The number of extracts to request. Default = 100'
+    )
+    parser.add_option(
+        '-d', '--days',
+        dest='days',
+        metavar='DAYS',
+        type='int',
+        default=30,
+        help='Only take the requests of the last days into account. Default = 30'
+    )
+    parser.add_option(
+        '-u', '--url',
+        dest='url',
+        metavar='URL',
+        help='The public URL of the server (e.g. https://oereb.example.com). It is part of the cache keys, '
+             'because the extracts contain links to the server.'
+    )
+    parser.add_option(
+        '-i', '--in-process',
+        dest='in_process',
+        action='store_true',
+        default=False,
+        help='Load the application from the ini-file and request the extracts in this process instead of '
+             'sending them to the server. This only fills a cache backend shared with the server (e.g. '
+             'pyramid_oereb.lib.cache.RedisCache).'
+    )
+    options, _ = parser.parse_args()
+    if not options.configfile:
+        parser.error('No configfile set')
+    if not options.url:
+        parser.error('No URL set')
+    logging.basicConfig(level=logging.INFO)
+
+    config = configparser.ConfigParser()
+    config.read(options.configfile)
+    handler_config = ast.literal_eval(config[options.config_section][options.config_sql_args])[0]
+    hot_requests = read_hot_extract_requests(
+        create_engine(handler_config['url']),
+        (handler_config.get('tableargs') or {}).get('schema'),
+        handler_config.get('tablename', 'logs'),
+        options.number,
+        options.days
+    )
+
+    base_url = options.url.rstrip('/')
+    if options.in_process:
+        from pyramid.paster import get_app
+        from pyramid.request import Request
+        from pyramid_oereb.lib.context import activate_request_context, release_request_context
+        app = get_app(options.configfile)
+
+        def send(path, parameters):
+            request = Request.blank(
+                '{0}?{1}'.format(path, urlencode(parameters)),
+                base_url=base_url,
+                headers={'User-Agent': USER_AGENT}
+            )
+            # Nothing read by one warm-up request is kept in the thread for the following ones
+            activate_request_context()
+            try:
+                return request.get_response(app).status_code
+            finally:
+                release_request_context()
+    else:
+        import requests
+
+        def send(path, parameters):
+            return requests.get(
+                base_url + path,
+                params=parameters,
+                headers={'User-Agent': USER_AGENT}
+            ).status_code
+
+    warm_up(hot_requests, send)
+
+
+def read_hot_extract_requests(engine, schema, tablename, limit, days):
+    """
+    Reads the most requested extracts from the table of the sqlalchemylogger.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine of the statistics database.
+        schema (str or None): The schema of the log table.
+        tablename (str): The name of the log table.
+        limit (int): The maximum number of extracts.
+        days (int): Only requests of the last days are taken into account.
+
+    Returns:
+        list of tuple: The path, the parameters (dict) and the number of requests of each extract, most
+        requested first.
+    """
+    table = '{0}.{1}'.format(schema, tablename) if schema else tablename
+    sql = text(
+        "SELECT cast(msg AS json) -> 'request' ->> 'path' AS path, "
+        "cast(msg AS json) -> 'request' ->> 'parameters' AS parameters, "
+        "COUNT(1) AS nb_requests "
+        "FROM {table} "
+        "WHERE logger = 'JSON' "
+        "AND cast(msg AS json) -> 'response' -> 'extras' ->> 'service' = 'GetExtractById' "
+        "AND cast(cast(msg AS json) -> 'response' ->> 'status_code' AS INTEGER) IN (200, 304) "
+        "AND created_at > now() - make_interval(days => :days) "
+        "GROUP BY 1, 2 "
+        "ORDER BY 3 DESC "
+        "LIMIT :limit".format(table=table)
+    )
+    with engine.connect() as connection:
+        rows = connection.execute(sql, days=days, limit=limit).fetchall()
+    return [(row.path, json.loads(row.parameters or '{}'), row.nb_requests) for row in rows]
+
+
+def warm_up(hot_requests, send):
+    """
+    Requests the passed extracts.
+
+    Args:
+        hot_requests (list of tuple): The path, the parameters and the number of requests of each extract.
+        send (callable): Callable accepting the path and the parameters which requests the extract and
+            returns the HTTP status code.
+
+    Returns:
+        int: The number of extracts which have been requested successfully.
+    """
+    success = 0
+    for path, parameters, _ in hot_requests:
+        try:
+            status_code = send(path, parameters)
+        except Exception:
+            log.exception('Warm-up request failed for {0}'.format(path))
+            continue
+        if status_code == 200:
+            success += 1
+        else:
+            log.warning('Warm-up request for {0} returned {1}'.format(path, status_code))
+    log.info('{0} of {1} extracts requested successfully'.format(success, len(hot_requests)))
+    return success
@@ -1,16 +1,138 @@
 # -*- coding: utf-8 -*-
+import itertools
 import logging
 import os
+import threading
 
+from contextlib import contextmanager
 from io import open
-from sqlalchemy import create_engine, orm
+from pyramid.config import ConfigurationError
+from timeit import default_timer as timer
+from sqlalchemy import create_engine, event, orm, text
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+from pyramid_oereb.lib.context import RequestScopedAttribute
 
 
 log = logging.getLogger(__name__)
 
 
+DEFAULT_POOL_SETTINGS = {
+    'pool_recycle': 3600,
+    'pool_pre_ping': True
+}
+"""dict: The pool settings used for connections without configured settings."""
+
+QUEUE_POOL_SETTINGS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_use_lifo')
+"""tuple of str: The pool settings which are only supported by a queue pool."""
+
+REPLICA_SELECTIONS = ('round_robin', 'least_busy')
+"""tuple of str: The supported strategies to select the read replica of a connection."""
+
+_query_scope = threading.local()
+
+
+@contextmanager
+def query_scope(name):
+    """
+    Context manager which attributes the statements executed by the current thread to the passed name (e.g.
+    the code of the topic being read) in the query statistics of :class:`DatabaseAdapter`.
+
+    Args:
+        name (str): The name of the scope.
+    """
+    previous = getattr(_query_scope, 'name', None)
+    _query_scope.name = name
+    try:
+        yield
+    finally:
+        _query_scope.name = previous
+
+
+@contextmanager
+def query_deadline(deadline):
+    """
+    Context manager which limits the duration of the database transactions begun by the current thread. The
+    remaining time is set as statement timeout of each transaction (PostgreSQL only), so statements still
+    running at the deadline are cancelled by the database.
+
+    Args:
+        deadline (float or None): The deadline as value of :func:`timeit.default_timer` or None for no limit.
+    """
+    previous = getattr(_query_scope, 'deadline', None)
+    _query_scope.deadline = deadline
+    try:
+        yield
+    finally:
+        _query_scope.deadline = previous
+
+
+def is_statement_timeout(error):
+    """
+    Checks whether a database error was caused by a statement timeout (see :func:`query_deadline`).
+
+    Args:
+        error (sqlalchemy.exc.DBAPIError): The error raised by the database.
+
+    Returns:
+        bool: True if the statement has been cancelled because of the statement timeout.
+    """
+    # SQLSTATE 57014 is query_canceled
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == '57014'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Remembers the start of a statement to measure its duration. It is kept in the execution context of the
+    statement, so nothing is left behind on the connection if the statement fails.
+    """
+    if context is not None:
+        context.query_start = timer()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    Queue pool which counts the checkouts and measures the time spent waiting for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+        self._stats_lock_ = threading.Lock()
+        self.checkouts = 0
+        self.wait_time = 0.0
+
+    def _do_get(self):
+        start = timer()
+        try:
+            return super(InstrumentedQueuePool, self)._do_get()
+        finally:
+            with self._stats_lock_:
+                self.checkouts += 1
+                self.wait_time += timer() - start
+
+    def recreate(self):
+        pool = super(InstrumentedQueuePool, self).recreate()
+        pool.checkouts = self.checkouts
+        pool.wait_time = self.wait_time
+        return pool
+
+
 class DatabaseAdapter(object):
     _connections_ = dict()
+    _pool_settings_ = dict()
+    _connection_pool_settings_ = dict()
+    _replicas_ = dict()
+    _replica_selection_ = 'round_robin'
+    _replica_counters_ = dict()
+    _query_totals_ = dict()
+    _query_statistics_lock_ = threading.Lock()
+    # The sessions shared during the current request, None if sessions are not shared
+    _request_sessions_ = RequestScopedAttribute('request_sessions', optional=True)
+    # The thread handling the request, only this thread uses the shared sessions
+    _request_thread_ = RequestScopedAttribute('request_thread', optional=True)
+    # The statistics of the statements executed during the current request, None if not collected
+    _query_statistics_ = RequestScopedAttribute('query_statistics', optional=True)
 
     def __init__(self):
         """
@@ -20,6 +142,57 @@ class DatabaseAdapter(object):
         """
         pass
 
+    def configure(self, pool_settings=None, connections=None, replicas=None, replica_selection=None):
+        """
+        Sets the settings of the connection pools and the read replicas. They are applied to connections
+        added afterwards.
+
+        Args:
+            pool_settings (dict or None): The settings for all connections. Supported are the pool
+                arguments of sqlalchemy.create_engine (e.g. pool_size, max_overflow, pool_timeout,
+                pool_recycle, pool_pre_ping) and statement_timeout, the maximum duration of a statement in
+                milliseconds (PostgreSQL only).
+            connections (dict or None): Settings overwriting the ones above for single connections, using
+                the rfc1738 URL string as key.
+            replicas (dict or None): The rfc1738 URL strings of the read replicas, as list using the URL
+                string of the primary connection as key. Read-only sessions are opened on the replicas.
+            replica_selection (str or None): The strategy to select a replica, either 'round_robin'
+                (default) or 'least_busy', which prefers the replica with the fewest checked out connections.
+
+        Raises:
+            pyramid.config.ConfigurationError: If the replica selection is not supported.
+        """
+        replica_selection = replica_selection or 'round_robin'
+        if replica_selection not in REPLICA_SELECTIONS:
+            raise ConfigurationError('Unsupported replica selection "{0}", use one of: {1}'.format(
+                replica_selection, ', '.join(REPLICA_SELECTIONS)
+            ))
+        DatabaseAdapter._pool_settings_ = dict(pool_settings or {})
+        DatabaseAdapter._connection_pool_settings_ = dict(connections or {})
+        DatabaseAdapter._replicas_ = dict(
+            (connection_string, list(replica_strings))
+            for connection_string, replica_strings in (replicas or {}).items() if replica_strings
+        )
+        DatabaseAdapter._replica_selection_ = replica_selection
+        DatabaseAdapter._replica_counters_ = dict(
+            (connection_string, itertools.count()) for connection_string in DatabaseAdapter._replicas_
+        )
+
+    def get_pool_settings(self, connection_string):
+        """
+        Returns the pool settings for the specified connection.
+
+        Args:
+            connection_string (str): The rfc1738 URL string which defines the database connection.
+
+        Returns:
+            dict: The pool settings.
+        """
+        settings = dict(DEFAULT_POOL_SETTINGS)
+        settings.update(self._pool_settings_)
+        settings.update(self._connection_pool_settings_.get(connection_string) or {})
+        return settings
+
     def add_connection(self, connection_string):
         """
         Adds a new connection to this object. Also creates the necessary engine and session object.
@@ -29,8 +202,13 @@ class DatabaseAdapter(object):
                 connection
         """
         if connection_string not in self._connections_:
-            engine = create_engine(connection_string, pool_recycle=30)
-            session = orm.scoped_session(orm.sessionmaker(bind=engine))
+            engine = create_engine(connection_string, **self._get_engine_arguments_(connection_string))
+            session_factory = orm.sessionmaker(bind=engine)
+            if engine.dialect.name == 'postgresql':
+                event.listen(session_factory, 'after_begin', _set_statement_timeout)
+            session = orm.scoped_session(session_factory)
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute_)
             self._connections_[connection_string] = {
                 'engine': engine,
                 'session': session
@@ -38,6 +216,131 @@ class DatabaseAdapter(object):
         else:
             log.info('Connection already exists: {0}'.format(connection_string))
 
+    def _get_engine_arguments_(self, connection_string):
+        """
+        Translates the pool settings of the connection into arguments of sqlalchemy.create_engine.
+
+        Args:
+            connection_string (str): The rfc1738 URL string which defines the database connection.
+
+        Returns:
+            dict: The keyword arguments for sqlalchemy.create_engine.
+        """
+        arguments = self.get_pool_settings(connection_string)
+        statement_timeout = arguments.pop('statement_timeout', None)
+        url = make_url(connection_string)
+        dialect = url.get_dialect()
+        if dialect.get_pool_class(url) is QueuePool:
+            arguments['poolclass'] = InstrumentedQueuePool
+        else:
+            # e.g. SQLite uses pools without size
+            for key in QUEUE_POOL_SETTINGS:
+                arguments.pop(key, None)
+        if statement_timeout is not None and dialect.name == 'postgresql':
+            arguments['connect_args'] = {'options': '-c statement_timeout={0}'.format(int(statement_timeout))}
+        return arguments
+
+    def warm_up(self):
+        """
+        Opens connections for all existing engines, as many as the pools keep open, so the first requests do
+        not have to wait for new connections. Connections which can not be opened are logged.
+        """
+        for connection_string, connection in self._connections_.items():
+            engine = connection.get('engine')
+            size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+            connections = []
+            try:
+                for _ in range(size):
+                    connections.append(engine.connect())
+            except Exception:
+                log.exception('Warm-up of connection {0} failed'.format(repr(engine.url)))
+            finally:
+                for db_connection in connections:
+                    db_connection.close()
+            log.info('Opened {0} connections to {1}'.format(len(connections), repr(engine.url)))
+
+    def get_pool_status(self):
+        """
+        Returns the state and counters of the connection pool of every engine. The keys are the connection
+        URLs with masked password.
+
+        Returns:
+            dict: For each connection the pool size, the number of connections checked out and in, the
+            overflow and, for queue pools, the total number of checkouts and seconds spent waiting for a
+            connection.
+        """
+        status = dict()
+        for connection in self._connections_.values():
+            engine = connection.get('engine')
+            pool = engine.pool
+            pool_status = {
+                'pool': type(pool).__name__
+            }
+            if isinstance(pool, QueuePool):
+                pool_status.update({
+                    'size': pool.size(),
+                    'checked_in': pool.checkedin(),
+                    'checked_out': pool.checkedout(),
+                    'overflow': pool.overflow()
+                })
+            if isinstance(pool, InstrumentedQueuePool):
+                pool_status.update({
+                    'checkouts': pool.checkouts,
+                    'wait_time': pool.wait_time
+                })
+            status[repr(engine.url)] = pool_status
+        return status
+
+    def get_query_statistics(self):
+        """
+        Returns the statistics of all statements executed since the start of the process, grouped by the
+        scope they were executed in (see :func:`query_scope`). Statements executed outside of a scope are
+        grouped as "other".
+
+        Returns:
+            dict: For each scope the number of statements, the total seconds spent executing them and the
+            number of rows they returned or affected.
+        """
+        with self._query_statistics_lock_:
+            return dict((scope, dict(totals)) for scope, totals in self._query_totals_.items())
+
+    def begin_query_statistics(self, query_statistics=None):
+        """
+        Starts collecting the statistics of the statements executed in the active request context, including
+        its worker threads.
+
+        Args:
+            query_statistics (dict or None): The statistics to continue, e.g. the ones of the request when
+                its response is generated in another request context. If None, new statistics are started.
+
+        Returns:
+            dict: The statistics of the request grouped by scope, see :meth:`get_query_statistics`. It is
+            filled while the statements are executed.
+        """
+        if query_statistics is None:
+            query_statistics = dict()
+        self._query_statistics_ = query_statistics
+        return query_statistics
+
+    def _after_cursor_execute_(self, conn, cursor, statement, parameters, context, executemany):
+        """
+        Adds the executed statement to the query statistics of the process and of the active request.
+        """
+        query_start = getattr(context, 'query_start', None)
+        duration = 0.0 if query_start is None else timer() - query_start
+        # The row count is -1 if the driver can not determine it
+        rows = max(cursor.rowcount, 0)
+        scope = getattr(_query_scope, 'name', None) or 'other'
+        query_statistics = self._query_statistics_
+        with self._query_statistics_lock_:
+            for statistics in (self._query_totals_, query_statistics):
+                if statistics is None:
+                    continue
+                totals = statistics.setdefault(scope, {'statements': 0, 'time': 0.0, 'rows': 0})
+                totals['statements'] += 1
+                totals['time'] += duration
+                totals['rows'] += rows
+
     def get_connections(self):
         """
         Returns a dictionary with the available connections.
@@ -47,7 +350,77 @@ class DatabaseAdapter(object):
         """
         return self._connections_
 
-    def get_session(self, key, request=None):
+    def get_replica(self, key):
+        """
+        Selects the connection used for reading from the specified connection. Without configured replicas
+        this is the connection itself. Replica connections are created on first use.
+
+        Args:
+            key (str): The key to identify the primary connection.
+
+        Returns:
+            str: The key of the selected connection.
+        """
+        replicas = self._replicas_.get(key)
+        if not replicas:
+            return key
+        for replica in replicas:
+            if replica not in self._connections_:
+                self.add_connection(replica)
+        if self._replica_selection_ == 'least_busy':
+            return min(replicas, key=self._get_checked_out_)
+        return replicas[next(self._replica_counters_[key]) % len(replicas)]
+
+    def _get_checked_out_(self, key):
+        """
+        Returns the number of connections currently checked out from the pool of a connection.
+
+        Args:
+            key (str): The key to identify the connection.
+
+        Returns:
+            int: The number of checked out connections, 0 for pools without size.
+        """
+        pool = self._connections_.get(key).get('engine').pool
+        return pool.checkedout() if isinstance(pool, QueuePool) else 0
+
+    def is_replica_behind(self, key):
+        """
+        Checks whether one of the read replicas of the connection has not yet replayed all changes committed
+        on the connection so far. Only PostgreSQL streaming replicas are checked, replicas which are not in
+        recovery (e.g. the primary itself) are considered up to date.
+
+        Args:
+            key (str): The key to identify the primary connection.
+
+        Returns:
+            bool: True if a replica is behind the primary connection, False if it has no replicas.
+        """
+        replicas = self._replicas_.get(key)
+        if not replicas:
+            return False
+        if key not in self._connections_:
+            self.add_connection(key)
+        engine = self._connections_.get(key).get('engine')
+        if engine.dialect.name != 'postgresql':
+            return False
+        with engine.connect() as connection:
+            lsn = connection.execute(text('SELECT pg_current_wal_lsn()::text')).scalar()
+        for replica in replicas:
+            if replica not in self._connections_:
+                self.add_connection(replica)
+            with self._connections_.get(replica).get('engine').connect() as connection:
+                behind = connection.execute(text(
+                    'SELECT pg_wal_lsn_diff(CAST(:lsn AS pg_lsn), pg_last_wal_replay_lsn()) > 0'
+                ), {'lsn': lsn}).scalar()
+            if behind:
+                log.info('Replica {0} has not yet replayed {1}'.format(
+                    repr(self._connections_.get(replica).get('engine').url), lsn
+                ))
+                return True
+        return False
+
+    def get_session(self, key, request=None, read_only=False):
         """
         The point where you will get what you need: The session to talk to the database!
 
@@ -57,6 +430,8 @@ class DatabaseAdapter(object):
             request (pyramid.request.Request or None): The request of the underlying pyramid
                 application. This can be useful to handle errorcases and treat sessions in
                 the right way.
+            read_only (bool): True if the session is only used for reading. It is opened on one of the
+                read replicas of the connection, if there are any.
 
         Returns:
             sqlalchemy.orm.Session: The requested clean session instance ready for use
@@ -65,12 +440,110 @@ class DatabaseAdapter(object):
             KeyError
         """
         if key in self._connections_:
+            request_sessions = self._request_sessions_
+            if request_sessions is not None and self._request_thread_ == threading.get_ident():
+                return self._get_request_session_(request_sessions, key, read_only)
+            if read_only:
+                key = self.get_replica(key)
             session = self._connections_.get(key).get('session')
             return session()
         else:
             self.add_connection(key)
             log.info('Connection does not exist, implicitly creating it: {0}'.format(key))
-            return self.get_session(key, request=request)
+            return self.get_session(key, request=request, read_only=read_only)
+
+    def begin_request(self):
+        """
+        Starts sharing the sessions in the active request context. Until :meth:`release_sessions` is called,
+        :meth:`get_session` returns the same session for the same connection string in the calling thread.
+        The session is bound to one connection, so closing it only ends its transaction and keeps the
+        connection. Other threads working for the request (e.g. reading topics concurrently) get their own
+        sessions as before and close them themselves, so releasing the shared sessions never interferes with
+        a thread which is still running.
+
+        Returns:
+            dict: The sessions of the request, to be passed to :meth:`release_sessions`.
+        """
+        request_sessions = dict()
+        self._request_sessions_ = request_sessions
+        self._request_thread_ = threading.get_ident()
+        return request_sessions
+
+    def release_sessions(self, request_sessions):
+        """
+        Closes the sessions of a request and returns their connections to the pool.
+
+        Args:
+            request_sessions (dict): The sessions returned by :meth:`begin_request`.
+        """
+        while request_sessions:
+            _, (session, connection) = request_sessions.popitem()
+            try:
+                session.close()
+            finally:
+                connection.close()
+
+    def request_subscriber(self, event):
+        """
+        Pyramid subscriber for :class:`pyramid.events.NewRequest` which shares the sessions during the request
+        and releases them when the request is finished. The statistics of the statements executed for the
+        request are available as `query_statistics` attribute of the request. It has to be registered after
+        :func:`pyramid_oereb.lib.context.request_context_subscriber`.
+
+        Args:
+            event (pyramid.events.NewRequest): The event emitted by pyramid.
+        """
+        request_sessions = self.begin_request()
+        event.request.query_statistics = self.begin_query_statistics()
+
+        def release(request):
+            self.release_sessions(request_sessions)
+
+        event.request.add_finished_callback(release)
+
+    def _get_request_session_(self, request_sessions, key, read_only=False):
+        """
+        Returns the session of the request for the specified connection. It is created on first use. A
+        read-only session stays on the replica selected then, so all reads of the request see the same state
+        of the data. Only read-only sessions run their transactions as read-only.
+
+        Args:
+            request_sessions (dict): The sessions of the request.
+            key (str): The key to identify the desired connection.
+            read_only (bool): True if the session is only used for reading.
+
+        Returns:
+            sqlalchemy.orm.Session: The shared session.
+        """
+        session_key = (key, read_only)
+        if session_key not in request_sessions:
+            connection_key = self.get_replica(key) if read_only else key
+            connection = self._connections_.get(connection_key).get('engine').connect()
+            session = orm.Session(bind=connection)
+            if connection.dialect.name == 'postgresql':
+                event.listen(session, 'after_begin', _set_statement_timeout)
+                if read_only:
+                    event.listen(session, 'after_begin', _set_transaction_read_only)
+            request_sessions[session_key] = (session, connection)
+        return request_sessions[session_key][0]
+
+
+def _set_transaction_read_only(session, transaction, connection):
+    """
+    Marks the transactions of the shared read-only request sessions as read-only.
+    """
+    connection.execute('SET TRANSACTION READ ONLY')
+
+
+def _set_statement_timeout(session, transaction, connection):
+    """
+    Limits the statements of a transaction to the time left until the deadline of the current thread (see
+    :func:`query_deadline`).
+    """
+    deadline = getattr(_query_scope, 'deadline', None)
+    if deadline is not None:
+        remaining = max(int((deadline - timer()) * 1000), 1)
+        connection.execute('SET LOCAL statement_timeout = {0}'.format(remaining))
 
 
 class FileAdapter(object):
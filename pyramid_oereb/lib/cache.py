@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Caches used to avoid processing the same extract again and again. The storage is provided by a backend
+(e.g. :class:`LRUCache` in process or :class:`RedisCache` shared between processes), the invalidation is
+handled by the :class:`VersionedCache` which binds every entry to the current :class:`DataVersion`.
+"""
+import hashlib
+import logging
+import pickle
+import threading
+from collections import OrderedDict
+from timeit import default_timer as timer
+
+from pyramid.config import ConfigurationError
+from pyramid.path import DottedNameResolver
+
+log = logging.getLogger(__name__)
+
+
+class BaseCache(object):
+    """
+    The basic cache backend class. Backends store values by string keys.
+    """
+
+    def get(self, key):
+        """
+        Returns the cached value.
+
+        Args:
+            key (str): The key of the entry.
+
+        Returns:
+            *: The cached value or None if there is no valid entry for the key.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def set(self, key, value):
+        """
+        Stores a value in the cache.
+
+        Args:
+            key (str): The key of the entry.
+            value (*): The value to store.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+
+class LRUCache(BaseCache):
+    """
+    Thread safe in process cache which evicts the least recently used entries as soon as the maximum size
+    is reached. Entries expire after the configured time to live.
+    """
+
+    def __init__(self, max_size=1000, ttl=None):
+        """
+        Args:
+            max_size (int): The maximum number of entries.
+            ttl (float or None): The time to live of an entry in seconds. None means no expiration.
+        """
+        self._max_size_ = max_size
+        self._ttl_ = ttl
+        self._entries_ = OrderedDict()
+        self._lock_ = threading.Lock()
+
+    def get(self, key):
+        with self._lock_:
+            entry = self._entries_.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < timer():
+                del self._entries_[key]
+                return None
+            self._entries_.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = timer() + self._ttl_ if self._ttl_ else None
+        with self._lock_:
+            self._entries_[key] = (expires, value)
+            self._entries_.move_to_end(key)
+            while len(self._entries_) > self._max_size_:
+                self._entries_.popitem(last=False)
+
+    def clear(self):
+        with self._lock_:
+            self._entries_.clear()
+
+    def __len__(self):
+        return len(self._entries_)
+
+
+class RedisCache(BaseCache):
+    """
+    Cache stored in a Redis server, which can be shared by several processes or hosts. Values are pickled.
+    This backend requires the `redis` package to be installed.
+    """
+
+    def __init__(self, url, ttl=None, prefix='pyramid_oereb'):
+        """
+        Args:
+            url (str): The Redis connection URL, e.g. ``redis://localhost:6379/0``.
+            ttl (int or None): The time to live of an entry in seconds. None means no expiration.
+            prefix (str): Prefix for all keys written by this cache.
+        """
+        try:
+            import redis
+        except ImportError:
+            raise ConfigurationError('The package "redis" is required to use the RedisCache.')
+        self._client_ = redis.StrictRedis.from_url(url)
+        self._ttl_ = ttl
+        self._prefix_ = prefix
+
+    def _key_(self, key):
+        return '{0}:{1}'.format(self._prefix_, key)
+
+    def get(self, key):
+        value = self._client_.get(self._key_(key))
+        if value is None:
+            return None
+        return pickle.loads(value)
+
+    def set(self, key, value):
+        self._client_.set(self._key_(key), pickle.dumps(value), ex=self._ttl_)
+
+    def clear(self):
+        for key in self._client_.scan_iter(match=self._key_('*')):
+            self._client_.delete(key)
+
+
+class DataVersion(object):
+    """
+    Provides the current version of the data the cached entries are based on. Obtaining the version may
+    require database queries, so it is refreshed at most once per check interval and can be shared by
+    several caches. Listeners are notified of changes, e.g. to reload the information kept by the sources.
+    """
+
+    def __init__(self, version_provider, version_check_interval=60):
+        """
+        Args:
+            version_provider (callable): Callable without arguments which returns the current version of the
+                data as string or None if the version is currently unknown, which disables caching until
+                the next check.
+            version_check_interval (float): The interval in seconds the version is checked.
+        """
+        self._version_provider_ = version_provider
+        self._version_check_interval_ = version_check_interval
+        self._version_ = None
+        self._known_version_ = None
+        self._version_checked_at_ = None
+        self._listeners_ = []
+        self._lock_ = threading.Lock()
+
+    def add_listener(self, listener):
+        """
+        Registers a callable which is called with the new version as soon as a change of the version is
+        detected. Unknown versions are not reported, a change is detected when the version is known again.
+
+        Args:
+            listener (callable): The callable accepting the new version.
+        """
+        self._listeners_.append(listener)
+
+    def _is_outdated_(self, now):
+        return self._version_checked_at_ is None or \
+            now - self._version_checked_at_ >= self._version_check_interval_
+
+    @property
+    def value(self):
+        """
+        Returns:
+            str or None: The current version of the data, None if it is unknown.
+        """
+        return self.check()
+
+    def check(self):
+        """
+        Checks the version of the data if the check interval has elapsed and notifies the listeners if it
+        changed.
+
+        Returns:
+            str or None: The current version of the data, None if it is unknown.
+        """
+        now = timer()
+        if self._is_outdated_(now):
+            with self._lock_:
+                if self._is_outdated_(now):
+                    version = self._version_provider_()
+                    if version is None:
+                        log.info('Data version unknown, caching is disabled until the next check.')
+                    elif self._known_version_ is not None and version != self._known_version_:
+                        log.info('Data version changed, cached entries are invalidated.')
+                        for listener in self._listeners_:
+                            listener(version)
+                    if version is not None:
+                        self._known_version_ = version
+                    self._version_ = version
+                    self._version_checked_at_ = now
+        return self._version_
+
+
+class VersionedCache(object):
+    """
+    Binds the entries of a cache backend to the version of the underlying data. As soon as the version
+    changes, all entries written before are no longer returned.
+    """
+
+    def __init__(self, backend, data_version):
+        """
+        Args:
+            backend (pyramid_oereb.lib.cache.BaseCache): The backend storing the entries.
+            data_version (pyramid_oereb.lib.cache.DataVersion): The version of the data.
+        """
+        self._backend_ = backend
+        self._data_version_ = data_version
+
+    @property
+    def backend(self):
+        """
+        Returns:
+            pyramid_oereb.lib.cache.BaseCache: The backend storing the entries.
+        """
+        return self._backend_
+
+    @property
+    def version(self):
+        """
+        Returns:
+            str or None: The current version of the data, None if it is unknown.
+        """
+        return self._data_version_.value
+
+    def key(self, *parts):
+        """
+        Creates the key for an entry from the passed parts and the current version of the data.
+
+        Args:
+            *parts: The parts identifying the entry. They are converted to strings.
+
+        Returns:
+            str or None: The key, None if the version of the data is unknown and nothing must be cached.
+        """
+        version = self.version
+        if version is None:
+            return None
+        raw = u'|'.join([version] + [u'{0}'.format(part) for part in parts])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached value.
+
+        Args:
+            key (str or None): The key created by :meth:`key`.
+
+        Returns:
+            *: The cached value or None.
+        """
+        if key is None:
+            return None
+        return self._backend_.get(key)
+
+    def set(self, key, value):
+        """
+        Stores a value.
+
+        Args:
+            key (str or None): The key created by :meth:`key`. Nothing is stored without key.
+            value (*): The value to store.
+        """
+        if key is not None:
+            self._backend_.set(key, value)
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        self._backend_.clear()
+
+
+def create_cache(cache_config, data_version):
+    """
+    Creates a versioned cache from its configuration.
+
+    Args:
+        cache_config (dict or None): The cache configuration containing the dotted `class` of the backend
+            and its `params`.
+        data_version (pyramid_oereb.lib.cache.DataVersion): The version of the data.
+
+    Returns:
+        pyramid_oereb.lib.cache.VersionedCache or None: The cache or None if it is not configured.
+    """
+    if not cache_config:
+        return None
+    backend_class = DottedNameResolver().maybe_resolve(
+        cache_config.get('class', 'pyramid_oereb.lib.cache.LRUCache')
+    )
+    backend = backend_class(**(cache_config.get('params') or {}))
+    return VersionedCache(backend, data_version)
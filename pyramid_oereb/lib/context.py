@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+The readers and sources of the processor are created once per process and shared between all requests. This
+module provides the request context which holds the state they produce while handling one single request
+(e.g. the `records` of a source). The context is bound to the current thread and has to be activated at the
+beginning of each request. Scripts using the readers and sources outside of a request activate and release a
+context themselves, so the state of one run does not pile up.
+"""
+import threading
+import weakref
+
+
+_local = threading.local()
+
+
+class RequestContext(object):
+    """
+    Container for the per request state of the shared readers and sources. The state is stored per owner
+    instance and attribute name. Owners are referenced weakly, so the context never keeps a reader or source
+    alive. A context may be activated in several threads at once (e.g. for concurrent topic reads).
+    """
+
+    def __init__(self):
+        self._state_ = weakref.WeakKeyDictionary()
+        self._lock_ = threading.Lock()
+
+    def get(self, owner, name, default_factory=None):
+        """
+        Returns the value stored for the specified owner and attribute name. If there is no value yet, it is
+        initialized using the passed factory.
+
+        Args:
+            owner (object): The instance the value belongs to.
+            name (str): The attribute name.
+            default_factory (callable or None): Callable without arguments used to create the initial
+                value. If None, the initial value is None.
+
+        Returns:
+            *: The stored value.
+        """
+        with self._lock_:
+            state = self._state_.setdefault(owner, dict())
+            if name not in state:
+                state[name] = default_factory() if default_factory else None
+            return state[name]
+
+    def set(self, owner, name, value):
+        """
+        Stores a value for the specified owner and attribute name.
+
+        Args:
+            owner (object): The instance the value belongs to.
+            name (str): The attribute name.
+            value (*): The value to store.
+        """
+        with self._lock_:
+            self._state_.setdefault(owner, dict())[name] = value
+
+
+class RequestScopedAttribute(object):
+    """
+    Descriptor which stores the attribute value in the active request context instead of the instance
+    itself. This way instances can be shared between requests (and threads) without mixing up their results.
+    """
+
+    def __init__(self, name, default_factory=None, optional=False):
+        """
+        Args:
+            name (str): The attribute name used as key in the request context.
+            default_factory (callable or None): Callable without arguments used to create the initial
+                value for each request.
+            optional (bool): If True, the attribute can be read without active request context. It has its
+                initial value then, which is not kept. Setting it always requires an active request context.
+        """
+        self._name_ = name
+        self._default_factory_ = default_factory
+        self._optional_ = optional
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if self._optional_ and getattr(_local, 'context', None) is None:
+            return self._default_factory_() if self._default_factory_ else None
+        return get_request_context().get(instance, self._name_, self._default_factory_)
+
+    def __set__(self, instance, value):
+        get_request_context().set(instance, self._name_, value)
+
+
+def get_request_context():
+    """
+    Returns the request context bound to the current thread.
+
+    Returns:
+        pyramid_oereb.lib.context.RequestContext: The active request context.
+
+    Raises:
+        RuntimeError: If no request context is active in the current thread.
+    """
+    context = getattr(_local, 'context', None)
+    if context is None:
+        raise RuntimeError('No request context is active. Use activate_request_context() and '
+                           'release_request_context() to use the readers and sources outside of a request.')
+    return context
+
+
+def activate_request_context(context=None):
+    """
+    Binds a request context to the current thread.
+
+    Args:
+        context (pyramid_oereb.lib.context.RequestContext or None): The context to activate. If None, a new
+            empty context is created.
+
+    Returns:
+        pyramid_oereb.lib.context.RequestContext: The activated context.
+    """
+    if context is None:
+        context = RequestContext()
+    _local.context = context
+    return context
+
+
+def release_request_context():
+    """
+    Removes the request context from the current thread.
+    """
+    _local.context = None
+
+
+def request_context_subscriber(event):
+    """
+    Pyramid subscriber for :class:`pyramid.events.NewRequest` which activates a fresh request context for
+    every request and releases it when the request is finished.
+
+    Args:
+        event (pyramid.events.NewRequest): The event emitted by pyramid.
+    """
+    context = activate_request_context()
+
+    def release(request):
+        if getattr(_local, 'context', None) is context:
+            release_request_context()
+
+    event.request.add_finished_callback(release)
@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
+import copy
+import functools
+import hashlib
 import logging
+import threading
 
 from operator import attrgetter
 
 from pyramid.path import DottedNameResolver
 
+from pyramid_oereb.lib.adapter import query_scope
+from pyramid_oereb.lib.cache import DataVersion, create_cache
 from pyramid_oereb.lib.config import Config
 from pyramid_oereb.lib.records.documents import DocumentRecord
 from pyramid_oereb.lib.records.plr import PlrRecord
@@ -21,7 +27,8 @@ log = logging.getLogger(__name__)
 class Processor(object):
 
     def __init__(self, real_estate_reader, municipality_reader, exclusion_of_liability_reader,
-                 glossary_reader, plr_sources, extract_reader):
+                 glossary_reader, plr_sources, extract_reader, extract_cache=None, response_cache=None,
+                 data_version=None):
         """
         The Processor class is directly bound to the get_extract_by_id service in this application. It's task
         is to unsnarl the difficult model of the oereb extract and handle all objects inside this extract
@@ -42,6 +49,12 @@ class Processor(object):
                 public law restriction source instances for runtime use wrapped in a list.
             extract_reader (pyramid_oereb.lib.readers.extract.ExtractReader): The extract reader
                 instance for runtime use.
+            extract_cache (pyramid_oereb.lib.cache.VersionedCache or None): The cache for processed
+                extracts. If None, every extract is processed from scratch.
+            response_cache (pyramid_oereb.lib.cache.VersionedCache or None): The cache for rendered
+                extract responses. If None, every extract is rendered from scratch.
+            data_version (pyramid_oereb.lib.cache.DataVersion or None): The version of the data, which is
+                checked before an extract is processed.
         """
         self._real_estate_reader_ = real_estate_reader
         self._municipality_reader_ = municipality_reader
@@ -49,6 +62,9 @@ class Processor(object):
         self._glossary_reader_ = glossary_reader
         self._plr_sources_ = plr_sources
         self._extract_reader_ = extract_reader
+        self._extract_cache_ = extract_cache
+        self._response_cache_ = response_cache
+        self._data_version_ = data_version
 
     def filter_published_documents(self, record):
         """
@@ -271,9 +287,74 @@ class Processor(object):
         """
         return self._extract_reader_
 
+    @property
+    def extract_cache(self):
+        """
+        Returns:
+            pyramid_oereb.lib.cache.VersionedCache or None: The cache for processed extracts.
+        """
+        return self._extract_cache_
+
+    @property
+    def response_cache(self):
+        """
+        Returns:
+            pyramid_oereb.lib.cache.VersionedCache or None: The cache for rendered extract responses.
+        """
+        return self._response_cache_
+
+    @property
+    def data_version(self):
+        """
+        Returns:
+            pyramid_oereb.lib.cache.DataVersion or None: The version of the data.
+        """
+        return self._data_version_
+
+    def get_data_version(self):
+        """
+        Combines the data versions of the real estate, municipality and public law restriction sources.
+
+        Returns:
+            str or None: The version of all data an extract is based on, None while a read replica is
+            behind its primary database.
+        """
+        return get_data_version(self._real_estate_reader_, self._municipality_reader_, self._plr_sources_)
+
+    @staticmethod
+    def get_extract_cache_key_parts(real_estate, params, sld_url):
+        """
+        Returns the values identifying a processed extract.
+
+        Args:
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate.
+            params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
+            sld_url (str): The URL which provides the sld to style the highlight of the real estate.
+
+        Returns:
+            tuple: The parts of the cache key.
+        """
+        topics = params.topics
+        if isinstance(topics, (list, tuple, set)):
+            topics = u','.join(sorted(topics))
+        return (
+            real_estate.egrid,
+            params.flavour,
+            params.format,
+            params.language,
+            topics,
+            params.images,
+            params.with_geometry,
+            sld_url
+        )
+
     def process(self, real_estate, params, sld_url):
         """
-        Central processing method to hook in from webservice.
+        Central processing method to hook in from webservice. Extracts taken from the extract cache are
+        delivered unchanged, including the identifier and creation date of their first delivery. The cache of
+        rendered extracts behaves the same way, it answers with the very same response body and ETag. Every
+        request gets a copy of the cached extract, so concurrent requests and the renderers can not change
+        the records of the cache.
 
         Args:
             real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
@@ -287,9 +368,24 @@ class Processor(object):
             pyramid_oereb.lib.records.extract.ExtractRecord: The generated extract record.
         """
         log.debug("process() start")
-        municipality = self._municipality_reader_.read(params, real_estate.fosnr)[0]
-        exclusions_of_liability = self._exclusion_of_liability_reader_.read(params)
-        glossaries = self._glossary_reader_.read(params)
+        if self._data_version_ is not None:
+            # Reloads the information kept by the sources if the data has changed since the last check
+            self._data_version_.check()
+        cache_key = None
+        if self._extract_cache_ is not None:
+            key_parts = self.get_extract_cache_key_parts(real_estate, params, sld_url)
+            cache_key = self._extract_cache_.key(*key_parts)
+            cached = self._extract_cache_.get(cache_key)
+            if cached is not None:
+                log.debug("process() done, returning cached extract.")
+                return copy.deepcopy(cached)
+
+        with query_scope('municipality'):
+            municipality = self._municipality_reader_.read(params, real_estate.fosnr)[0]
+        with query_scope('exclusion_of_liability'):
+            exclusions_of_liability = self._exclusion_of_liability_reader_.read(params)
+        with query_scope('glossary'):
+            glossaries = self._glossary_reader_.read(params)
         extract_raw = self._extract_reader_.read(params, real_estate, municipality)
         extract = self.plr_tolerance_check(extract_raw)
 
@@ -314,20 +410,69 @@ class Processor(object):
         if params.flavour == 'full':
             if Config.get('full_extract_use_sld', True):
                 extract.real_estate.set_highlight_url(sld_url)
+        # Extracts with topics which could not be read in time are incomplete and must not be cached
+        if cache_key is not None and not self._extract_reader_.degraded_topics:
+            self._extract_cache_.set(cache_key, copy.deepcopy(extract))
         log.debug("process() done, returning extract.")
         return extract
 
 
+def get_data_version(real_estate_reader, municipality_reader, plr_sources):
+    """
+    Combines the data versions of the real estate, municipality and public law restriction sources.
+
+    Args:
+        real_estate_reader (pyramid_oereb.lib.readers.real_estate.RealEstateReader): The real estate
+            reader.
+        municipality_reader (pyramid_oereb.lib.readers.municipality.MunicipalityReader): The municipality
+            reader.
+        plr_sources (list of pyramid_oereb.lib.sources.plr.PlrBaseSource): The public law restriction
+            sources.
+
+    Returns:
+        str or None: The version of all data an extract is based on. None while a read replica has not yet
+        replayed all changes of the primary database the versions are read from, as the extracts read from
+        the replica may not match the version yet.
+    """
+    from pyramid_oereb import database_adapter
+
+    sources = [real_estate_reader.source, municipality_reader.source]
+    sources.extend(plr_sources)
+    versions = [u'{0}'.format(source.get_data_version()) for source in sources]
+    # Checked after reading the versions, so the replicas contain at least the versioned changes
+    connections = set([getattr(source, '_key_', None) for source in sources])
+    connections.discard(None)
+    for connection in connections:
+        if database_adapter.is_replica_behind(connection):
+            return None
+    return hashlib.sha1(u'|'.join(versions).encode('utf-8')).hexdigest()
+
+
+def refresh_sources(plr_sources, data_version):
+    """
+    Reloads the information the public law restriction sources keep between requests, like availabilities
+    and legend entries, after the data has changed.
+
+    Args:
+        plr_sources (list of pyramid_oereb.lib.sources.plr.PlrBaseSource): The public law restriction
+            sources.
+        data_version (str): The new version of the data.
+    """
+    log.info('Refreshing the public law restriction sources for data version {0}'.format(data_version))
+    for plr_source in plr_sources:
+        plr_source.refresh()
+
+
 def create_processor():
     """
-    Creates and returns a processor based on the application configuration.
-    You should use one (and only one) processor per request. Otherwise some results can be mixed or
-    missing.
+    Creates and returns a new processor based on the application configuration. Creating a processor
+    resolves all configured sources and initializes them, which includes database queries for every
+    configured topic. At runtime you should therefore use the shared instance returned by
+    :func:`get_processor` instead.
 
     Returns:
         pyramid_oereb.lib.processor.Processor: A processor.
     """
-
     real_estate_config = Config.get_real_estate_config()
     municipality_config = Config.get_municipality_config()
     exclusion_of_liability_config = Config.get_exclusion_of_liability_config()
@@ -335,6 +480,11 @@ def create_processor():
     extract = Config.get_extract_config()
     certification = extract.get('certification')
     certification_at_web = extract.get('certification_at_web')
+    plr_reader_config = extract.get('plr_reader') or {}
+    if plr_reader_config.get('executor') == 'thread_pool':
+        max_workers = plr_reader_config.get('max_workers', 4)
+    else:
+        max_workers = None
 
     plr_cadastre_authority = Config.get_plr_cadastre_authority()
 
@@ -368,8 +518,24 @@ def create_processor():
         plr_cadastre_authority,
         certification,
         certification_at_web,
+        max_workers=max_workers,
+        topic_timeout=plr_reader_config.get('topic_timeout'),
+        extract_timeout=plr_reader_config.get('extract_timeout'),
+        combined_query=plr_reader_config.get('combined_query', False)
     )
 
+    cache_config = Config.get('cache') or {}
+    data_version = DataVersion(
+        functools.partial(get_data_version, real_estate_reader, municipality_reader, plr_sources),
+        cache_config.get('version_check_interval', 60)
+    )
+    # The information kept by the sources between requests is reloaded after every import, the version
+    # they have been initialized with is read right away
+    data_version.check()
+    data_version.add_listener(functools.partial(refresh_sources, plr_sources))
+    extract_cache = create_cache(cache_config.get('extract'), data_version)
+    response_cache = create_cache(cache_config.get('response'), data_version)
+
     return Processor(
         real_estate_reader=real_estate_reader,
         municipality_reader=municipality_reader,
@@ -377,4 +543,74 @@ def create_processor():
         glossary_reader=glossary_reader,
         plr_sources=plr_sources,
         extract_reader=extract_reader,
+        extract_cache=extract_cache,
+        response_cache=response_cache,
+        data_version=data_version
     )
+
+
+class ProcessorRegistry(object):
+    """
+    Process wide bucket for the processor and with it all the configured readers and sources. They are
+    created only once and shared between all requests. The state which belongs to a single request is kept
+    in the request context (see :mod:`pyramid_oereb.lib.context`).
+    """
+
+    def __init__(self):
+        self._processor_ = None
+        self._lock_ = threading.Lock()
+
+    def get_processor(self):
+        """
+        Returns the shared processor. It is created on first access if it was not initialized before.
+
+        Returns:
+            pyramid_oereb.lib.processor.Processor: The shared processor.
+        """
+        if self._processor_ is None:
+            with self._lock_:
+                if self._processor_ is None:
+                    self._processor_ = create_processor()
+        return self._processor_
+
+    def refresh(self):
+        """
+        Creates a new processor and replaces the shared one. Requests which are already running keep using
+        the previous instance. Call this method after importing data to reload the information the sources
+        read on initialisation (e.g. availabilities and data integration dates). The threads of the previous
+        processor are shut down, so it reads sequentially until its running requests are done.
+
+        Returns:
+            pyramid_oereb.lib.processor.Processor: The new shared processor.
+        """
+        processor = create_processor()
+        with self._lock_:
+            previous = self._processor_
+            self._processor_ = processor
+        if previous is not None:
+            previous.extract_reader.shutdown()
+        log.info('Shared processor refreshed.')
+        return processor
+
+
+processor_registry = ProcessorRegistry()
+
+
+def get_processor():
+    """
+    Returns the processor shared by all requests.
+
+    Returns:
+        pyramid_oereb.lib.processor.Processor: The shared processor.
+    """
+    return processor_registry.get_processor()
+
+
+def refresh_processor():
+    """
+    Reloads the processor shared by all requests, e.g. after a data import.
+
+    Returns:
+        pyramid_oereb.lib.processor.Processor: The new shared processor.
+    """
+    return processor_registry.refresh()
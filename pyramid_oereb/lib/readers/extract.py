@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 import datetime
 import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from timeit import default_timer as timer
 from pyramid.path import DottedNameResolver
 
 from shapely.geometry import box
+from sqlalchemy.exc import DBAPIError
 
+from pyramid_oereb.lib.adapter import is_statement_timeout, query_deadline, query_scope
 from pyramid_oereb.lib.config import Config
+from pyramid_oereb.lib.context import RequestScopedAttribute, activate_request_context, \
+    get_request_context, release_request_context
 from pyramid_oereb.lib.records.embeddable import EmbeddableRecord
 from pyramid_oereb.lib.records.extract import ExtractRecord
 from pyramid_oereb.lib.records.image import ImageRecord
@@ -24,11 +31,17 @@ class ExtractReader(object):
     Attributes:
         extract (pyramid_oereb.lib.records.extract.ExtractRecord or None): The extract as a record
             representation. On initialisation this is None. It will be set by calling the read method of the
-            instance.
+            instance and is stored in the active request context.
+        degraded_topics (list of str): The codes of the topics which could not be read within the configured
+            time budget during the last call of the read method. They are reported as themes without data.
     """
 
+    extract = RequestScopedAttribute('extract')
+    degraded_topics = RequestScopedAttribute('degraded_topics', list)
+
     def __init__(self, plr_sources, plr_cadastre_authority, certification=None,
-                 certification_at_web=None):
+                 certification_at_web=None, max_workers=None, topic_timeout=None, extract_timeout=None,
+                 combined_query=False):
         """
         Args:
             plr_sources (list of pyramid_oereb.lib.sources.plr.PlrBaseSource): The list of PLR source
@@ -38,12 +51,37 @@ class ExtractReader(object):
             logos (dict): The logos of confederation, canton and oereb wrapped in a ImageRecord.
             certification (dict of unicode or None): A mutlilingual dictionary of certification information.
             certification_at_web (dict of unicode or None): Multilingual list of certification uri.
+            max_workers (int or None): The number of threads used to read the PLR sources concurrently. If
+                None or lower than 2, the sources are read one after another.
+            topic_timeout (float or None): The time in seconds to wait for a single topic. It can be
+                overwritten per topic by the `timeout` of the PLR configuration. It is counted from the moment
+                the topic starts to be read and applied to its database statements (PostgreSQL only), so it
+                also limits topics read sequentially.
+            extract_timeout (float or None): The time in seconds to wait for all topics of one extract.
+            combined_query (bool): Let the PLR sources search the topics together before they are read one
+                by one (see :meth:`pyramid_oereb.lib.sources.plr.PlrBaseSource.prefetch`).
         """
-        self.extract = None
         self._plr_sources_ = plr_sources
         self._plr_cadastre_authority_ = plr_cadastre_authority
         self._certification = certification
         self._certification_at_web = certification_at_web
+        self._topic_timeout_ = topic_timeout
+        self._extract_timeout_ = extract_timeout
+        self._combined_query_ = combined_query
+        if max_workers and max_workers > 1:
+            self._executor_ = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            self._executor_ = None
+
+    def shutdown(self):
+        """
+        Stops the threads reading the PLR sources concurrently. Topics which are already being read are
+        finished, extracts read afterwards read their topics sequentially.
+        """
+        executor = self._executor_
+        self._executor_ = None
+        if executor is not None:
+            executor.shutdown(wait=False)
 
     @property
     def plr_cadastre_authority(self):
@@ -76,6 +114,215 @@ class ExtractReader(object):
         """
         return self._certification_at_web
 
+    @staticmethod
+    def _read_plr_source_(plr_source, params, real_estate, bbox, position, deadline=None):
+        """
+        Reads the records of one PLR source.
+
+        Args:
+            plr_source (pyramid_oereb.lib.sources.plr.PlrBaseSource): The source to read.
+            params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate.
+            bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
+            position (int): The position of the topic in the configuration.
+            deadline (float or None): The time until the database statements of the source are allowed to
+                run (see :func:`pyramid_oereb.lib.adapter.query_deadline`).
+
+        Returns:
+            list of pyramid_oereb.lib.records.plr.EmptyPlrRecord: The records of the source.
+        """
+        log.debug("read() going to read from plr_source {}".format(plr_source))
+        with query_scope(plr_source.info.get('code')), query_deadline(deadline):
+            records = plr_source.read(params, real_estate, bbox, position)
+        if records is None:
+            # Sources implemented against the former API store their results in the records attribute
+            records = plr_source.records
+        log.debug("read() done reading from plr_source {}".format(plr_source))
+        return records
+
+    def _read_plr_source_in_context_(self, context, started, plr_source, params, real_estate, bbox, position,
+                                     extract_deadline):
+        """
+        Reads the records of one PLR source in a worker thread using the request context of the calling
+        thread. The time the worker starts is stored in `started` using the position as key, the time budget
+        of the topic is counted from then on.
+        """
+        activate_request_context(context)
+        try:
+            start = timer()
+            started[position] = start
+            deadline = self._get_topic_deadline_(plr_source, start, extract_deadline)
+            return self._read_plr_source_(plr_source, params, real_estate, bbox, position, deadline)
+        finally:
+            release_request_context()
+
+    def _get_topic_timeout_(self, plr_source):
+        """
+        Returns the time budget of one topic.
+
+        Args:
+            plr_source (pyramid_oereb.lib.sources.plr.PlrBaseSource): The source of the topic.
+
+        Returns:
+            float or None: The time in seconds or None if the topic is not limited.
+        """
+        timeout = plr_source.info.get('timeout')
+        if timeout is None:
+            timeout = self._topic_timeout_
+        return timeout
+
+    def _get_topic_deadline_(self, plr_source, start, extract_deadline):
+        """
+        Returns the time until a topic may be read.
+
+        Args:
+            plr_source (pyramid_oereb.lib.sources.plr.PlrBaseSource): The source of the topic.
+            start (float): The time the topic started to be read.
+            extract_deadline (float or None): The deadline of the whole extract.
+
+        Returns:
+            float or None: The earlier of the topic's and the extract's deadline or None if both are not
+            limited.
+        """
+        deadlines = [] if extract_deadline is None else [extract_deadline]
+        topic_timeout = self._get_topic_timeout_(plr_source)
+        if topic_timeout:
+            deadlines.append(start + topic_timeout)
+        return min(deadlines) if deadlines else None
+
+    def _degrade_topic_(self, plr_source, reason):
+        """
+        Marks a topic as degraded. It will be reported as theme without data.
+
+        Args:
+            plr_source (pyramid_oereb.lib.sources.plr.PlrBaseSource): The source of the topic.
+            reason (str): The reason which is logged.
+
+        Returns:
+            list of pyramid_oereb.lib.records.plr.EmptyPlrRecord: The record replacing the topic's results.
+        """
+        code = plr_source.info.get('code')
+        log.warning('Topic {0} is reported without data: {1}'.format(code, reason))
+        self.degraded_topics.append(code)
+        return [EmptyPlrRecord(Config.get_theme(code), has_data=False)]
+
+    @staticmethod
+    def _prefetch_plr_sources_(plr_sources, real_estate, bbox):
+        """
+        Passes the PLR sources grouped by their class to the prefetch hook of the class. If prefetching
+        fails, the sources are read one by one as usual.
+
+        Args:
+            plr_sources (list of (int, pyramid_oereb.lib.sources.plr.PlrBaseSource)): The sources to read
+                with their position in the configuration.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate.
+            bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
+        """
+        plr_sources_by_class = OrderedDict()
+        for _, plr_source in plr_sources:
+            plr_sources_by_class.setdefault(type(plr_source), []).append(plr_source)
+        for plr_source_class, class_plr_sources in plr_sources_by_class.items():
+            try:
+                with query_scope('prefetch'):
+                    plr_source_class.prefetch(class_plr_sources, real_estate, bbox)
+            except Exception:
+                log.exception('Prefetching the topics of {0} failed'.format(plr_source_class))
+
+    def _read_plr_sources_(self, plr_sources, params, real_estate, bbox):
+        """
+        Reads the passed PLR sources, concurrently if an executor is configured. Topics which exceed their
+        time budget or the time budget of the extract are degraded (see :meth:`_degrade_topic_`).
+
+        Args:
+            plr_sources (list of (int, pyramid_oereb.lib.sources.plr.PlrBaseSource)): The sources to read
+                with their position in the configuration.
+            params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate.
+            bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
+
+        Returns:
+            list of list of pyramid_oereb.lib.records.plr.EmptyPlrRecord: The records of each source in the
+            order of the passed sources.
+        """
+        extract_deadline = timer() + self._extract_timeout_ if self._extract_timeout_ else None
+        results = []
+
+        executor = self._executor_
+        if executor is None:
+            for position, plr_source in plr_sources:
+                start = timer()
+                if extract_deadline is not None and start >= extract_deadline:
+                    results.append(self._degrade_topic_(plr_source, 'extract time budget exceeded'))
+                    continue
+                deadline = self._get_topic_deadline_(plr_source, start, extract_deadline)
+                try:
+                    results.append(
+                        self._read_plr_source_(plr_source, params, real_estate, bbox, position, deadline)
+                    )
+                except DBAPIError as err:
+                    if not is_statement_timeout(err):
+                        raise
+                    results.append(self._degrade_topic_(plr_source, 'time budget exceeded'))
+            return results
+
+        context = get_request_context()
+        started = dict()
+        futures = []
+        try:
+            for position, plr_source in plr_sources:
+                futures.append(executor.submit(
+                    self._read_plr_source_in_context_, context, started, plr_source, params, real_estate,
+                    bbox, position, extract_deadline
+                ))
+        except RuntimeError:
+            # The executor has been shut down in the meantime (see shutdown)
+            for future in futures:
+                future.cancel()
+            return self._read_plr_sources_(plr_sources, params, real_estate, bbox)
+        for (position, plr_source), future in zip(plr_sources, futures):
+            try:
+                results.append(self._wait_for_topic_(future, started, position, plr_source, extract_deadline))
+            except TimeoutError:
+                # A topic which did not start yet is dropped, a running one is stopped by the database as
+                # soon as its statement timeout is reached.
+                future.cancel()
+                results.append(self._degrade_topic_(plr_source, 'time budget exceeded'))
+            except DBAPIError as err:
+                if not is_statement_timeout(err):
+                    raise
+                results.append(self._degrade_topic_(plr_source, 'time budget exceeded'))
+        return results
+
+    def _wait_for_topic_(self, future, started, position, plr_source, extract_deadline):
+        """
+        Waits for the records of a topic read by a worker thread. The time the topic waits for a free worker
+        is not counted against its time budget.
+
+        Args:
+            future (concurrent.futures.Future): The future of the topic.
+            started (dict): The start times of the topics which are being read, using their position as key.
+            position (int): The position of the topic in the configuration.
+            plr_source (pyramid_oereb.lib.sources.plr.PlrBaseSource): The source of the topic.
+            extract_deadline (float or None): The deadline of the whole extract.
+
+        Returns:
+            list of pyramid_oereb.lib.records.plr.EmptyPlrRecord: The records of the source.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the topic or the extract exceeded its time budget.
+        """
+        while True:
+            start = started.get(position)
+            # A topic which did not start yet is allowed its whole budget from now on
+            deadline = self._get_topic_deadline_(plr_source, timer() if start is None else start,
+                                                 extract_deadline)
+            try:
+                return future.result(timeout=None if deadline is None else max(deadline - timer(), 0))
+            except TimeoutError:
+                extract_exceeded = extract_deadline is not None and timer() >= extract_deadline
+                if start is not None or extract_exceeded:
+                    raise
+
     def read(self, params, real_estate, municipality):
         """
         This method finally creates the extract.
@@ -98,6 +345,7 @@ class ExtractReader(object):
         """
         log.debug("read() start")
         assert isinstance(municipality.logo, ImageRecord)
+        self.degraded_topics = list()
 
         bbox = ViewServiceRecord.get_bbox(real_estate.limit)
         bbox = box(bbox[0], bbox[1], bbox[2], bbox[3])
@@ -109,15 +357,33 @@ class ExtractReader(object):
 
         if municipality.published:
 
-            for position, plr_source in enumerate(self._plr_sources_, start=1):
-                if not params.skip_topic(plr_source.info.get('code')):
-                    log.debug("read() going to read from plr_source {}".format(plr_source))
-                    plr_source.read(params, real_estate, bbox, position)
-                    log.debug("read() done reading from plr_source {}".format(plr_source))
+            plr_sources = [
+                (position, plr_source) for position, plr_source in enumerate(self._plr_sources_, start=1)
+                if not params.skip_topic(plr_source.info.get('code'))
+            ]
+            # Topics without data in the municipality are not read at all
+            plr_sources_to_read = [
+                (position, plr_source) for position, plr_source in plr_sources
+                if plr_source.has_data_in_municipality(municipality)
+            ]
+            if self._combined_query_:
+                self._prefetch_plr_sources_(plr_sources_to_read, real_estate, bbox)
+            plr_records = dict(zip(
+                [position for position, _ in plr_sources_to_read],
+                self._read_plr_sources_(plr_sources_to_read, params, real_estate, bbox)
+            ))
+
+            # Merge the results in the configured order of the topics
+            for position, plr_source in plr_sources:
+                records = plr_records.get(position)
+                if records is None:
+                    records = [EmptyPlrRecord(Config.get_theme(plr_source.info.get('code')))]
+                # Topics which could not be read in time are listed without data source
+                if plr_source.info.get('code') not in self.degraded_topics:
                     for ds in plr_source.datasource:
                         if not params.skip_topic(ds.theme.code):
                             datasource.append(ds)
-                    real_estate.public_law_restrictions.extend(plr_source.records)
+                real_estate.public_law_restrictions.extend(records)
 
             for plr in real_estate.public_law_restrictions:
 
@@ -24,6 +24,15 @@ class MunicipalityReader(object):
         source_class = DottedNameResolver().maybe_resolve(dotted_source_class_path)
         self._source_ = source_class(**params)
 
+    @property
+    def source(self):
+        """
+        Returns:
+            pyramid_oereb.lib.sources.municipality.MunicipalityBaseSource: The source
+            instance used by this reader.
+        """
+        return self._source_
+
     def read(self, params, fosnr=None):
         """
         The central read accessor method to get all desired records from configured source.
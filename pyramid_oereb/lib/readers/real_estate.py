@@ -28,6 +28,15 @@ class RealEstateReader(object):
         source_class = DottedNameResolver().resolve(dotted_source_class_path)
         self._source_ = source_class(**params)
 
+    @property
+    def source(self):
+        """
+        Returns:
+            pyramid_oereb.lib.sources.real_estate.RealEstateBaseSource: The source
+            instance used by this reader.
+        """
+        return self._source_
+
     def read(self, params, nb_ident=None, number=None, egrid=None, geometry=None):
         """
         The central read accessor method to get all desired records from configured source.
@@ -45,8 +54,9 @@ class RealEstateReader(object):
             number (str or None): The number of parcel or also known real estate. This parameter
                 is directly related to the nb_ident parameter and both must be set!
                 Combination will deliver only one result or crashes.
-            (str or None): The unique identifier of the desired real estate. This will deliver
-                only one result or crashes.
+            egrid (str or list of str or None): The unique identifier of the desired real estate. This
+                will deliver only one result or crashes. A list of identifiers (used by the batch extract)
+                delivers one result per identifier.
             geometry (str): A geometry as WKT string which is used to obtain intersected real
                 estates. This may deliver several results.
 
@@ -11,6 +11,24 @@ from shapely.geometry import Point, MultiPoint, LineString, Polygon, GeometryCol
 log = logging.getLogger(__name__)
 
 
+class IntersectionMeasures(object):
+    """
+    The measures of the intersection of a geometry with the real estate. They are calculated by the source
+    (e.g. in the database), so the geometry itself is not needed to check the tolerances.
+
+    Args:
+        geom_type (str): The type of the geometry as configured in the geometry types (e.g. Polygon).
+        area (float): The area of the polygonal part of the intersection.
+        length (float): The length of the linear part of the intersection.
+        nr_of_points (int): The number of points of the punctual part of the intersection.
+    """
+    def __init__(self, geom_type, area, length, nr_of_points):
+        self.geom_type = geom_type
+        self.area = area
+        self.length = length
+        self.nr_of_points = nr_of_points
+
+
 class GeometryRecord(object):
     """
     Geometry record
@@ -25,23 +43,28 @@ class GeometryRecord(object):
         public_law_restriction (pyramid_oereb.lib.records.plr.PlrRecord): The public law
             restriction
         office (pyramid_oereb.lib.records.office.Office): The office
+        intersection_measures (IntersectionMeasures or None): The pre-calculated measures of the
+            intersection with the real estate. If passed, they are used by :meth:`calculate` instead of
+            intersecting the geometry and the geometry may be None.
 
     Raises:
         AttributeError: Error when a wrong geometry type was passed.
     """
     def __init__(
             self, law_status, published_from, geom, geo_metadata=None, public_law_restriction=None,
-            office=None):
+            office=None, intersection_measures=None):
 
         self.law_status = law_status
         self.published_from = published_from
         self.geo_metadata = geo_metadata
-        if isinstance(geom, (Point, MultiPoint, LineString, Polygon)):
+        if isinstance(geom, (Point, MultiPoint, LineString, Polygon)) or \
+                (geom is None and intersection_measures is not None):
             self.geom = geom
         else:
             raise AttributeError(u'The passed geometry is not supported: {type}'.format(type=geom.type))
         self.public_law_restriction = public_law_restriction
         self.office = office
+        self.intersection_measures = intersection_measures
         self._units = None
         self._area_share = None
         self._length_share = None
@@ -76,6 +99,13 @@ class GeometryRecord(object):
         else:
             return -1
 
+    @property
+    def geom_type(self):
+        """str: The geometry type."""
+        if self.geom is None:
+            return self.intersection_measures.geom_type
+        return self.geom.type
+
     @property
     def dim(self):
         """int: The topological dimension."""
@@ -111,10 +141,54 @@ class GeometryRecord(object):
         else:
             return result
 
+    def _measure_intersection(self, real_estate):
+        """
+        Intersects the geometry with the real estate and measures the part with the same topological
+        dimension as the geometry.
+
+        Args:
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate record.
+
+        Returns:
+            tuple: The number of points, the length and the area of the intersection. Only the measure
+            matching the geometry type is set, the others are None.
+        """
+        geometry_types = Config.get('geometry_types')
+        line_types = geometry_types.get('line').get('types')
+        polygon_types = geometry_types.get('polygon').get('types')
+        point_types = geometry_types.get('point').get('types')
+        result = self._extract_collection(self.geom.intersection(real_estate.limit))
+        # TODO upon update to Shapely 1.7, a check for result.is_emtpy will be needed (see PR#1037)
+        # differentiate between Points and MultiPoint
+        if self.geom.type in point_types:
+            if result.type == point_types[1]:
+                # If it is a multipoint make a list and count the number of elements in the list
+                return len(list(result.geoms)), None, None
+            elif result.type == point_types[0]:
+                # If it is a single point the number of points is one
+                return 1, None, None
+        elif self.geom.type in line_types and result.type in line_types:
+            return None, result.length, None
+        elif self.geom.type in polygon_types and result.type in polygon_types:
+            return None, None, result.area
+        else:
+            # This intersection result should not be used for the OEREB extract:
+            # for example, if two polygons are touching each other, the intersection geometry will be
+            # the point or linestring representing the touching part.
+            log.debug(
+                u'Intersection result changed geometry type. '
+                u'Original geometry was {0} and result is {1}'.format(
+                    self.geom.type,
+                    result.type
+                )
+            )
+        return None, None, None
+
     def calculate(self, real_estate, min_length, min_area, length_unit, area_unit):
         """
         Entry method for calculation. It checks if the geometry type of this instance is a geometry
-        collection which has to be unpacked first in case of collection.
+        collection which has to be unpacked first in case of collection. If the intersection measures have
+        been calculated by the source already, they are only compared with the thresholds.
 
         Args:
             real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate record.
@@ -131,49 +205,35 @@ class GeometryRecord(object):
         polygon_types = geometry_types.get('polygon').get('types')
         point_types = geometry_types.get('point').get('types')
         if self.published:
-            result = self._extract_collection(self.geom.intersection(real_estate.limit))
-            # TODO upon update to Shapely 1.7, a check for result.is_emtpy will be needed (see PR#1037)
-            # differentiate between Points and MultiPoint
-            if self.geom.type not in point_types + line_types + polygon_types:
+            if self.geom_type not in point_types + line_types + polygon_types:
                 supported_types = ', '.join(point_types + line_types + polygon_types)
                 raise AttributeError(
                     u'The passed geometry is not supported: {type}. It should be one of: {types}'.format(
-                        type=self.geom.type, types=supported_types
+                        type=self.geom_type, types=supported_types
                     )
                 )
-            elif self.geom.type in point_types:
-                if result.type == point_types[1]:
-                    # If it is a multipoint make a list and count the number of elements in the list
-                    self._nr_of_points = len(list(result.geoms))
-                    self._test_passed = True
-                elif result.type == point_types[0]:
-                    # If it is a single point the number of points is one
-                    self._nr_of_points = 1
+            if self.intersection_measures is None:
+                nr_of_points, length_share, area_share = self._measure_intersection(real_estate)
+            else:
+                # Empty parts of the intersection are measured with 0 by the source
+                nr_of_points = self.intersection_measures.nr_of_points or None
+                length_share = self.intersection_measures.length or None
+                area_share = self.intersection_measures.area or None
+            if self.geom_type in point_types:
+                if nr_of_points:
+                    self._nr_of_points = nr_of_points
                     self._test_passed = True
-            elif self.geom.type in line_types and result.type in line_types:
+            elif self.geom_type in line_types and length_share is not None:
                 self._units = length_unit
-                length_share = result.length
                 if length_share >= min_length:
                     self._length_share = length_share
                     self._test_passed = True
-            elif self.geom.type in polygon_types and result.type in polygon_types:
+            elif self.geom_type in polygon_types and area_share is not None:
                 self._units = area_unit
-                area_share = result.area
                 compensated_area = area_share / real_estate.areas_ratio
                 if compensated_area >= min_area:
                     self._area_share = compensated_area
                     self._test_passed = True
-            else:
-                # This intersection result should not be used for the OEREB extract:
-                # for example, if two polygons are touching each other, the intersection geometry will be
-                # the point or linestring representing the touching part.
-                log.debug(
-                    u'Intersection result changed geometry type. '
-                    u'Original geometry was {0} and result is {1}'.format(
-                        self.geom.type,
-                        result.type
-                    )
-                )
         self.calculated = True
         return self._test_passed
 
@@ -25,6 +25,19 @@ class ImageRecord(object):
 
         self.content = content
 
+    @property
+    def content(self):
+        """
+        Returns:
+            binary: The binary information of this image.
+        """
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+        self._file_type = None
+
     def encode(self):
         """
         Returns the image as base64 encoded string.
@@ -123,6 +136,17 @@ class ImageRecord(object):
         """
         return ImageRecord._validate_filetype(obj)[1]
 
+    def _get_file_type(self):
+        """
+        Detects the file type of the content once and returns it on subsequent calls.
+
+        Returns:
+            tuple: The file's extension and mime type.
+        """
+        if self._file_type is None:
+            self._file_type = ImageRecord._validate_filetype(bytearray(self.content))
+        return self._file_type
+
     @property
     def mimetype(self):
         """
@@ -131,7 +155,7 @@ class ImageRecord(object):
         Returns:
             str: The file's extension.
         """
-        return ImageRecord.get_mimetype(bytearray(self.content))
+        return self._get_file_type()[1]
 
     @property
     def extension(self):
@@ -141,4 +165,4 @@ class ImageRecord(object):
         Returns:
             str: The file's mime type.
         """
-        return ImageRecord.get_extension(bytearray(self.content))
+        return self._get_file_type()[0]
@@ -4,6 +4,9 @@ This is package provides the minimum requirements on the classes which can be us
 """
 from pyramid.config import ConfigurationError
 from pyramid.path import DottedNameResolver
+from sqlalchemy import text
+
+from pyramid_oereb.lib.context import RequestScopedAttribute
 
 
 class Base(object):
@@ -12,9 +15,20 @@ class Base(object):
     class for inherit in special designed classes.
 
     Attributes:
-        records (list): The list which will be filled up with records in the process.
+        records (list): The list which will be filled up with records in the process. It is stored in the
+            active request context, so one source instance can be shared between requests.
     """
-    records = list()
+    records = RequestScopedAttribute('records', list)
+
+    def get_data_version(self):
+        """
+        Returns an identifier of the current state of the data delivered by this source. It is used to
+        invalidate cached extracts. Sources which are not able to detect changes return None.
+
+        Returns:
+            str or None: The data version.
+        """
+        return None
 
 
 class BaseDatabaseSource(Base):
@@ -46,3 +60,22 @@ class BaseDatabaseSource(Base):
             self._model_ = DottedNameResolver().maybe_resolve(kwargs.get('model'))
         else:
             raise ConfigurationError('"model" for source has to be defined in used yaml configuration file')
+
+    def get_data_version(self):
+        """
+        Returns the number of rows inserted, updated and deleted in the table of the source's model since
+        the statistics of the database server were reset. It changes with every modification of the table.
+
+        Returns:
+            str or None: The data version.
+        """
+        table = self._model_.__table__
+        session = self._adapter_.get_session(self._key_)
+        try:
+            version = session.execute(text(
+                'SELECT n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_user_tables '
+                'WHERE schemaname = :schema AND relname = :table'
+            ), {'schema': table.schema or 'public', 'table': table.name}).scalar()
+        finally:
+            session.close()
+        return None if version is None else str(version)
@@ -20,8 +20,6 @@ class PlrBaseSource(Base):
     Base class for public law restriction sources.
 
     Attributes:
-        records (list of pyramid_oereb.lib.records.plr.EmptyPlrRecord): List of public law restriction
-            records.
         datasource (list of pyramid_oereb.lib.records.embeddable.DatasourceRecord): List of data source
             records used for the additional data in flavour `embeddable`.
     """
@@ -70,6 +68,43 @@ class PlrBaseSource(Base):
         """
         return self._plr_info
 
+    @classmethod
+    def prefetch(cls, plr_sources, real_estate, bbox):
+        """
+        Optional hook which is called with all sources of this class before they are read for one extract.
+        Sources which can search several topics at once (e.g. in the same database) may do this here and
+        keep the results for the following calls of :meth:`read`. The default implementation does nothing.
+
+        Args:
+            plr_sources (list of PlrBaseSource): The sources of this class which will be read.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate.
+            bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
+        """
+        pass
+
+    def has_data_in_municipality(self, municipality):
+        """
+        Optional hook to skip a topic without data in the municipality of the real estate. If it returns
+        False, the source is not read and the topic is reported as not concerned. Return False only if
+        reading the topic would not find any public law restriction. The default implementation returns True.
+
+        Args:
+            municipality (pyramid_oereb.lib.records.municipality.MunicipalityRecord): The municipality
+                of the real estate.
+
+        Returns:
+            bool: False if the topic contains no data in the municipality.
+        """
+        return True
+
+    def refresh(self):
+        """
+        Optional hook which is called as soon as the data version changes (e.g. after an import). Sources
+        which keep information about the data between requests have to reload it here. The default
+        implementation does nothing.
+        """
+        pass
+
     def read(self, params, real_estate, bbox, position=None):
         """
         Every public law restriction source has to implement a read method. This method must accept the two
@@ -85,5 +120,10 @@ class PlrBaseSource(Base):
                 public law restrictions that are related to the real estate but also the ones which are in
                 the visible extent of the map.
             position (int or None): relative position of the plr (within a list of plrs)
+
+        Returns:
+            list of pyramid_oereb.lib.records.plr.EmptyPlrRecord: The public law restriction records found
+            for the real estate. The source instance is shared between requests and topics may be read
+            concurrently, so the records must be returned instead of being stored on the instance.
         """
-        self.records = list()
+        return list()
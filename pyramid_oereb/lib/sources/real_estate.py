@@ -25,8 +25,9 @@ class RealEstateBaseSource(Base):
             number (str or None): The number of parcel or also known real estate. This parameter
                 is directly related to the nb_ident parameter and both must be set!
                 Combination must deliver only one result or must raise an error.
-            (str or None): The unique identifier of the desired real estate. This must deliver only one
-                result or must raise an error.
+            egrid (str or list of str or None): The unique identifier of the desired real estate. This
+                must deliver only one result or must raise an error. A list of identifiers (used by the
+                batch extract) must deliver one result per identifier.
             geometry (str): A geometry as WKT string which is used to obtain intersected real
                 estates. This may deliver several results.
         """
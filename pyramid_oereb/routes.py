@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from pyramid_oereb import route_prefix
-from pyramid_oereb.views.webservice import PlrWebservice, Symbol, Logo, Municipality, Sld
+from pyramid_oereb.lib.config import Config
+from pyramid_oereb.views.webservice import PlrWebservice, Symbol, Logo, Municipality, Sld, Metrics
 from pyramid_oereb.contrib.stats.decorators import log_response
 
 
@@ -253,5 +254,31 @@ def includeme(config):  # pragma: no cover
         decorator=log_response
     )
 
+    # Get extracts of several real estates at once
+    config.add_route('{0}/extract_batch'.format(route_prefix),
+                     '/extract_batch/{flavour}/{format}')
+    config.add_route('{0}/extract_batch_geometry'.format(route_prefix),
+                     '/extract_batch/{flavour}/{format}/{param1}')
+    config.add_view(
+        PlrWebservice,
+        attr='get_extract_batch',
+        route_name='{0}/extract_batch'.format(route_prefix),
+        request_method='POST',
+        decorator=log_response
+    )
+    config.add_view(
+        PlrWebservice,
+        attr='get_extract_batch',
+        route_name='{0}/extract_batch_geometry'.format(route_prefix),
+        request_method='POST',
+        decorator=log_response
+    )
+
+    # Database metrics of the process, only if enabled
+    if (Config.get('database') or {}).get('metrics'):
+        config.add_route('{0}/metrics'.format(route_prefix), '/metrics')
+        config.add_view(Metrics, attr='get_metrics', route_name='{0}/metrics'.format(route_prefix),
+                        request_method='GET')
+
     # Commit config
     config.commit()
@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+import copy
+import gzip
+import logging.config
+import multiprocessing
+import optparse
+import os
+
+from urllib.parse import urlencode
+
+from pyramid.config import Configurator
+from pyramid.renderers import render
+from pyramid.request import Request
+from pyramid.scripting import prepare
+
+import pyramid_oereb
+from pyramid_oereb.lib.config import Config
+from pyramid_oereb.lib.context import activate_request_context, release_request_context
+from pyramid_oereb.lib.processor import get_processor
+from pyramid_oereb.views.webservice import Parameter
+
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = 'checkpoint.txt'
+"""str: Name of the file in the output directory listing the EGRIDs which have already been generated."""
+
+FORMATS = {
+    'json': ('reduced', 'pyramid_oereb_extract_json', 'json'),
+    'xml': ('reduced', 'pyramid_oereb_extract_xml', 'xml'),
+    'pdf': ('full', 'pyramid_oereb_extract_print', 'spec.json')
+}
+"""dict: The flavour, renderer and file extension used for each supported format. For PDF the print
+specification is generated instead of the PDF itself."""
+
+_worker = dict()
+
+
+def create_registry(config_file, section='pyramid_oereb', c2ctemplate_style=False, route_prefix=None):
+    """
+    Creates the pyramid registry of the application without running a server. This loads the configuration
+    and initializes the shared processor.
+
+    Args:
+        config_file (str): The path to the configuration yaml file.
+        section (str): The section which contains the configuration.
+        c2ctemplate_style (bool): True if the yaml file is using a c2ctemplate style (starting with vars).
+        route_prefix (str or None): The route prefix the application is published with.
+
+    Returns:
+        pyramid.registry.Registry: The registry of the application.
+    """
+    if c2ctemplate_style:
+        settings = {'pyramid_oereb.cfg.c2ctemplate.file': config_file}
+    else:
+        settings = {'pyramid_oereb.cfg.file': config_file}
+    settings['pyramid_oereb.cfg.section'] = section
+    config = Configurator(settings=settings)
+    config.include('pyramid_oereb', route_prefix=route_prefix)
+    config.commit()
+    return config.registry
+
+
+def read_checkpoint(output_dir):
+    """
+    Reads the EGRIDs which have been generated by a previous run.
+
+    Args:
+        output_dir (str): The output directory.
+
+    Returns:
+        set of str: The EGRIDs already generated.
+    """
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if not os.path.isfile(path):
+        return set()
+    with open(path) as f:
+        return set(line.strip() for line in f if line.strip())
+
+
+def get_output_path(output_dir, egrid, output_format):
+    """
+    Returns the path of the compressed file an extract is written to.
+
+    Args:
+        output_dir (str): The output directory.
+        egrid (str): The EGRID of the real estate.
+        output_format (str): The format of the extract.
+
+    Returns:
+        str: The path of the output file.
+    """
+    return os.path.join(output_dir, '{0}.{1}.gz'.format(egrid, FORMATS[output_format][2]))
+
+
+def write_output(path, content):
+    """
+    Writes the content gzip compressed. The file is written under a temporary name first, so interrupted
+    runs never leave truncated files.
+
+    Args:
+        path (str): The path of the output file.
+        content (str or bytes): The content to write.
+    """
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    tmp_path = '{0}.tmp'.format(path)
+    with gzip.open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.rename(tmp_path, path)
+
+
+def collect_egrids(fosnr):
+    """
+    Returns the EGRIDs of all real estates of a municipality.
+
+    Args:
+        fosnr (int): The federal number of the municipality.
+
+    Returns:
+        list of str: The EGRIDs of the municipality's real estates.
+    """
+    processor = get_processor()
+    params = Parameter('json')
+    activate_request_context()
+    try:
+        municipalities = processor.municipality_reader.read(params, fosnr)
+        if len(municipalities) != 1 or not municipalities[0].geom:
+            raise ValueError('No municipality with geometry found for {0}'.format(fosnr))
+        geometry = 'SRID={0};{1}'.format(Config.get('srid'), municipalities[0].geom)
+        real_estates = processor.real_estate_reader.read(params, geometry=geometry)
+        return sorted(
+            real_estate.egrid for real_estate in real_estates
+            if real_estate.fosnr == fosnr and real_estate.egrid
+        )
+    finally:
+        release_request_context()
+
+
+def init_worker(options):
+    """
+    Initializes a process of the pool. If the application has not been inherited from the parent process
+    (forked), it is created from the configuration.
+
+    Args:
+        options (dict): The options of the run.
+    """
+    if _worker.get('registry') is None:
+        _worker['registry'] = create_registry(
+            options['config'],
+            section=options['section'],
+            c2ctemplate_style=options['c2ctemplate_style'],
+            route_prefix=options['route_prefix']
+        )
+    prepare(registry=_worker['registry'])
+    _worker['options'] = options
+
+
+def generate_extract(egrid):
+    """
+    Generates the extracts of one real estate in all requested formats and writes them to the output
+    directory. This runs in a process of the pool.
+
+    Args:
+        egrid (str): The EGRID of the real estate.
+
+    Returns:
+        tuple: The EGRID and the error message or None if the extracts have been generated.
+    """
+    options = _worker['options']
+    processor = get_processor()
+    activate_request_context()
+    try:
+        real_estates = processor.real_estate_reader.read(Parameter('json'), egrid=egrid)
+        if len(real_estates) != 1:
+            return egrid, 'No real estate found'
+        for output_format in options['formats']:
+            flavour, renderer, _ = FORMATS[output_format]
+            query = {'lang': options['language']} if options['language'] else {}
+            if output_format == 'pdf':
+                query['getspec'] = 'yes'
+            request = Request.blank('/?{0}'.format(urlencode(query)), base_url=options['base_url'])
+            request.registry = _worker['registry']
+            params = Parameter(
+                output_format,
+                flavour=flavour,
+                with_geometry=options['with_geometry'] or (
+                    output_format == 'pdf' and Config.get('print', {}).get('with_geometry', True)
+                ),
+                egrid=egrid,
+                language=options['language']
+            )
+            # Each format is processed in a context of its own, so the records of the previous one are dropped
+            release_request_context()
+            activate_request_context()
+            # Processing adds the public law restrictions to the real estate, so each format needs its own
+            extract = processor.process(
+                copy.deepcopy(real_estates[0]),
+                params,
+                request.route_url('{0}/sld'.format(pyramid_oereb.route_prefix))
+            )
+            content = render(renderer, (extract, params), request=request)
+            write_output(get_output_path(options['output_dir'], egrid, output_format), content)
+        return egrid, None
+    except Exception as e:
+        log.exception('Generating the extracts of {0} failed'.format(egrid))
+        return egrid, '{0}'.format(e)
+    finally:
+        release_request_context()
+
+
+def generate_extracts(egrids, options, processes=None):
+    """
+    Generates the extracts of the passed real estates in a pool of processes. EGRIDs listed in the
+    checkpoint of the output directory are skipped, every successfully generated EGRID is added to it.
+
+    Args:
+        egrids (list of str): The EGRIDs of the real estates.
+        options (dict): The options of the run.
+        processes (int or None): The number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        dict: The EGRIDs which could not be generated with the error message.
+    """
+    if not os.path.isdir(options['output_dir']):
+        os.makedirs(options['output_dir'])
+    done = read_checkpoint(options['output_dir']) if options.get('resume', True) else set()
+    pending = [egrid for egrid in egrids if egrid not in done]
+    log.info('Generating extracts for {0} real estates ({1} already done)'.format(
+        len(pending), len(egrids) - len(pending)
+    ))
+
+    # Database connections must not be shared with the forked processes
+    for connection in pyramid_oereb.database_adapter.get_connections().values():
+        connection.get('engine').dispose()
+
+    failed = dict()
+    checkpoint_path = os.path.join(options['output_dir'], CHECKPOINT_FILE)
+    checkpoint_mode = 'a' if options.get('resume', True) else 'w'
+    with multiprocessing.Pool(processes=processes, initializer=init_worker, initargs=(options,)) as pool, \
+            open(checkpoint_path, checkpoint_mode) as checkpoint:
+        results = pool.imap_unordered(generate_extract, pending, chunksize=10)
+        for i, (egrid, error) in enumerate(results):
+            if error is None:
+                checkpoint.write('{0}\n'.format(egrid))
+                checkpoint.flush()
+            else:
+                failed[egrid] = error
+            if (i + 1) % 100 == 0:
+                log.info('{0} of {1} real estates processed'.format(i + 1, len(pending)))
+    log.info('Done, {0} real estates failed'.format(len(failed)))
+    return failed
+
+
+def run():
+    logging.config.dictConfig({
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'standard': {
+                'format': '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+            },
+        },
+        'handlers': {
+            'default': {
+                'level': 'INFO',
+                'class': 'logging.StreamHandler',
+                'formatter': 'standard'
+            },
+        },
+        'loggers': {
+            'pyramid_oereb.standard.generate_extracts': {
+                'handlers': ['default'],
+                'level': 'INFO',
+                'propagate': True
+            }
+        }
+    })
+
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options] [EGRID ...]',
+        description='Generates the extracts of the specified real estates or all real estates of a '
+                    'municipality and writes them gzip compressed to the output directory. Interrupted runs '
+                    'are resumed unless --no-resume is set.'
+    )
+    parser.add_option(
+        '-c', '--config',
+        dest='config',
+        metavar='YAML',
+        type='string',
+        help='The path to the configuration yaml file.'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='section',
+        metavar='SECTION',
+        type='string',
+        default='pyramid_oereb',
+        help='The section which contains configuration (default is: pyramid_oereb).'
+    )
+    parser.add_option(
+        '--c2ctemplate-style',
+        dest='c2ctemplate_style',
+        action='store_true',
+        default=False,
+        help='Is the yaml file using a c2ctemplate style (starting with vars)'
+    )
+    parser.add_option(
+        '-m', '--municipality',
+        dest='fosnr',
+        metavar='FOSNR',
+        type='int',
+        help='Generate the extracts of all real estates of the municipality.'
+    )
+    parser.add_option(
+        '-e', '--egrid-file',
+        dest='egrid_file',
+        metavar='FILE',
+        type='string',
+        help='A file containing the EGRIDs to generate, one per line.'
+    )
+    parser.add_option(
+        '-o', '--output-dir',
+        dest='output_dir',
+        metavar='DIR',
+        type='string',
+        help='The directory the extracts are written to.'
+    )
+    parser.add_option(
+        '-f', '--format',
+        dest='formats',
+        metavar='FORMAT',
+        type='choice',
+        choices=sorted(FORMATS.keys()),
+        action='append',
+        help='The format to generate: json, xml or pdf (print specification). Can be repeated '
+             '(default is: json and xml).'
+    )
+    parser.add_option(
+        '-l', '--language',
+        dest='language',
+        metavar='LANG',
+        type='string',
+        help='The language of the extracts (default is the configured default language).'
+    )
+    parser.add_option(
+        '-g', '--with-geometry',
+        dest='with_geometry',
+        action='store_true',
+        default=False,
+        help='Include the geometries in the extracts.'
+    )
+    parser.add_option(
+        '-p', '--processes',
+        dest='processes',
+        metavar='NUMBER',
+        type='int',
+        help='The number of processes (default is the number of CPUs).'
+    )
+    parser.add_option(
+        '-u', '--base-url',
+        dest='base_url',
+        metavar='URL',
+        type='string',
+        default='http://localhost',
+        help='The URL of the application used for links in the extracts (default is: http://localhost).'
+    )
+    parser.add_option(
+        '-r', '--route-prefix',
+        dest='route_prefix',
+        metavar='PREFIX',
+        type='string',
+        help='The route prefix the application is published with.'
+    )
+    parser.add_option(
+        '--no-resume',
+        dest='resume',
+        action='store_false',
+        default=True,
+        help='Ignore the checkpoint of a previous run and generate all extracts again.'
+    )
+
+    options, args = parser.parse_args()
+    if not options.config:
+        parser.error('No configuration file set.')
+    if not options.output_dir:
+        parser.error('No output directory set.')
+
+    egrids = list(args)
+    if options.egrid_file:
+        with open(options.egrid_file) as f:
+            egrids.extend(line.strip() for line in f if line.strip())
+
+    # The application is inherited by the forked processes of the pool
+    _worker['registry'] = create_registry(
+        options.config,
+        section=options.section,
+        c2ctemplate_style=options.c2ctemplate_style,
+        route_prefix=options.route_prefix
+    )
+
+    if options.fosnr:
+        egrids.extend(collect_egrids(options.fosnr))
+    if not egrids:
+        parser.error('No EGRIDs or municipality defined.')
+
+    failed = generate_extracts(
+        list(sorted(set(egrids))),
+        {
+            'config': options.config,
+            'section': options.section,
+            'c2ctemplate_style': options.c2ctemplate_style,
+            'route_prefix': options.route_prefix,
+            'output_dir': options.output_dir,
+            'formats': options.formats or ['json', 'xml'],
+            'language': options.language,
+            'with_geometry': options.with_geometry,
+            'base_url': options.base_url,
+            'resume': options.resume
+        },
+        processes=options.processes
+    )
+    for egrid, error in sorted(failed.items()):
+        log.error('{0}: {1}'.format(egrid, error))
@@ -52,7 +52,7 @@ def get_municipality(request):
     """
     fosnr = request.matchdict.get('fosnr')
     source_params = Config.get_municipality_config().get('source').get('params')
-    session = database_adapter.get_session(source_params.get('db_connection'))
+    session = database_adapter.get_session(source_params.get('db_connection'), read_only=True)
     try:
         model = DottedNameResolver().resolve(source_params.get('model'))
         municipality = session.query(model).filter_by(fosnr=fosnr).first()
@@ -94,7 +94,7 @@ def get_symbol(request):
         raise HTTPNotFound('No theme with code {}.'.format(theme_code))
 
     source_params = plr.get('source').get('params')
-    session = database_adapter.get_session(source_params.get('db_connection'))
+    session = database_adapter.get_session(source_params.get('db_connection'), read_only=True)
 
     try:
         model = DottedNameResolver().resolve('{module_}.{class_}'.format(
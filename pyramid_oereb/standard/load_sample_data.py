@@ -6,10 +6,12 @@ import optparse
 import os
 
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.engine import Connection
 from sqlalchemy.orm import sessionmaker, class_mapper
 
 from pyramid_oereb.lib.config import Config
+from pyramid_oereb.standard.subdivide_geometries import get_subdivide_statements
 
 
 class SampleData(object):
@@ -101,6 +103,31 @@ class SampleData(object):
                 for r in json.loads(f.read()):
                     self._do_sql_insert(sql, r)
 
+    def _subdivide_geometries(self, schema):
+        """
+        Fills the table of the subdivided geometries if the topic using the models is configured with the
+        source parameter subdivide_max_vertices.
+
+        Args:
+            schema (module): The module containing the models of the topic.
+        """
+        max_vertices = None
+        for plr in Config.get('plrs') or []:
+            params = plr.get('source').get('params')
+            if params.get('models') == schema.__name__:
+                max_vertices = params.get('subdivide_max_vertices')
+        if not max_vertices:
+            return
+        for statement in get_subdivide_statements(schema, max_vertices):
+            if self._sql_file is None:
+                if self._has_connection():
+                    self._connection.execute(statement)
+            else:
+                self._sql_file.write(u"{};\n".format(statement.compile(
+                    dialect=postgresql.dialect(),
+                    compile_kwargs={'literal_binds': True}
+                )))
+
     def _truncate_existing(self, schema):
         """
         Truncates existing tables.
@@ -234,6 +261,7 @@ class SampleData(object):
                     (schema.DocumentReference, 'document_reference.json'),
                 ]:
                     self._load_sample(class_, os.path.join('plr119', folder, file_name))
+                self._subdivide_geometries(schema)
             for class_, file_name in [
                 (RealEstate, 'real_estates.json'),
                 (Address, 'addresses.json'),
@@ -411,6 +411,34 @@ class Geometry(Base):
     responsible_office = relationship(Office)
 
 
+class SubdividedGeometry(Base):
+    """
+    Optional companion table of the geometries. It contains the geometries split into parts with a limited
+    number of vertices (see ST_Subdivide). The bounding boxes of the parts are much smaller than the one of a
+    huge geometry, so the spatial index is selective again. It is filled by the import scripts if the source
+    parameter subdivide_max_vertices is set.
+
+    Attributes:
+        id (int): The identifier. This is used in the database only and must not be set manually. If
+            you  don't like it - don't care about.
+        geometry_id (str): The foreign key to the geometry this part belongs to.
+        geometry (pyramid_oereb.standard.models.contaminated_civil_aviation_sites.Geometry):
+            The dedicated relation to the geometry instance from database.
+        geom (geoalchemy2.types.Geometry): The part of the geometry.
+    """
+    __table_args__ = {'schema': 'contaminated_civil_aviation_sites'}
+    __tablename__ = 'subdivided_geometry'
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    geom = sa.Column(GeoAlchemyGeometry('GEOMETRY', srid=srid), nullable=False)
+    geometry_id = sa.Column(
+        sa.String,
+        sa.ForeignKey(Geometry.id, ondelete='CASCADE'),
+        nullable=False,
+        index=True
+    )
+    geometry = relationship(Geometry)
+
+
 class PublicLawRestrictionBase(Base):
     """
     Meta bucket (join table) for public law restrictions which acts as a base for other public law
@@ -21,7 +21,7 @@ class DatabaseSource(BaseDatabaseSource, AddressBaseSource):
             zip_code (int): The postal zipcode for the desired address.
             street_number (str): The house or so called street number of the desired address.
         """
-        session = self._adapter_.get_session(self._key_)
+        session = self._adapter_.get_session(self._key_, read_only=True)
         try:
             query = session.query(self._model_)
             results = [query.filter(
@@ -14,7 +14,7 @@ class DatabaseSource(BaseDatabaseSource, ExclusionOfLiabilityBaseSource):
         Args:
             params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
         """
-        session = self._adapter_.get_session(self._key_)
+        session = self._adapter_.get_session(self._key_, read_only=True)
         try:
             results = session.query(self._model_).all()
 
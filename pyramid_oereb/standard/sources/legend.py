@@ -14,7 +14,7 @@ class DatabaseSource(BaseDatabaseSource, LegendBaseSource):
             params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
             (kwargs): Arbitrary keyword arguments. It must contain the key 'type_code'.
         """
-        session = self._adapter_.get_session(self._key_)
+        session = self._adapter_.get_session(self._key_, read_only=True)
         try:
             query = session.query(self._model_)
             if kwargs.get('type_code'):
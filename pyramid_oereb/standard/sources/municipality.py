@@ -20,7 +20,7 @@ class DatabaseSource(BaseDatabaseSource, MunicipalityBaseSource):
             params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
             fosnr (int or None): The federal number of the municipality defined by the statistics office.
         """
-        session = self._adapter_.get_session(self._key_)
+        session = self._adapter_.get_session(self._key_, read_only=True)
         try:
             self.records = list()
             if fosnr:
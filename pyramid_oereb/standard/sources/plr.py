@@ -1,16 +1,23 @@
 # -*- coding: utf-8 -*-
 import logging
+from collections import namedtuple, OrderedDict
 
 from geoalchemy2.shape import to_shape, from_shape
+from pyramid.config import ConfigurationError
 from pyramid.path import DottedNameResolver
+from shapely import wkt
 from shapely.geometry import Point, LineString, Polygon, MultiPoint, MultiLineString, MultiPolygon, \
     GeometryCollection
-from sqlalchemy import text, or_, and_
+from sqlalchemy import or_, and_, func, inspect, literal, literal_column, bindparam, cast, \
+    LargeBinary, Text
+from sqlalchemy.orm import Load
 
 from pyramid_oereb import Config
 from pyramid_oereb.lib import b64
+from pyramid_oereb.lib.context import RequestScopedAttribute
 from pyramid_oereb.lib.records.availability import AvailabilityRecord
 from pyramid_oereb.lib.records.embeddable import DatasourceRecord
+from pyramid_oereb.lib.records.geometry import IntersectionMeasures
 from pyramid_oereb.lib.records.image import ImageRecord
 from pyramid_oereb.lib.records.law_status import LawStatusRecord
 from pyramid_oereb.lib.records.office import OfficeRecord
@@ -21,8 +28,74 @@ from pyramid_oereb.lib.sources.plr import PlrBaseSource
 
 log = logging.getLogger(__name__)
 
+LOADER_STRATEGIES = {
+    'selectin': 'selectinload',
+    'joined': 'joinedload',
+    'lazy': None
+}
+"""dict: The supported strategies to load the records related to the public law restrictions, mapped to the
+name of the SQLAlchemy loader option. 'lazy' disables eager loading."""
+
+DOCUMENT_RELATIONSHIPS = {
+    'responsible_office': {},
+    'articles': {},
+    'referenced_documents': {
+        'referenced_document': {
+            'responsible_office': {},
+            'articles': {}
+        }
+    }
+}
+"""dict: The relationships of a document which are needed to create its record."""
+
+PLR_RELATIONSHIPS = {
+    'view_service': {},
+    'responsible_office': {},
+    'geometries': {
+        'responsible_office': {}
+    },
+    'legal_provisions': {
+        'document': DOCUMENT_RELATIONSHIPS
+    }
+}
+"""dict: The relationships of a public law restriction which are needed to create its record."""
+
+IndexedLegendEntry = namedtuple('IndexedLegendEntry', [
+    'symbol',
+    'legend_text',
+    'type_code',
+    'type_code_list',
+    'view_service_id',
+    'sub_theme',
+    'other_theme'
+])
+"""collections.namedtuple: A legend entry of the legend entry index of a topic. The symbol is an already
+decoded pyramid_oereb.lib.records.image.ImageRecord."""
+
+PrefetchedPlr = namedtuple('PrefetchedPlr', [
+    'id',
+    'type_code',
+    'view_service_id',
+    'intersects_real_estate'
+])
+"""collections.namedtuple: A public law restriction found in the bbox by the combined query of several
+topics (see DatabaseSource.prefetch)."""
+
 
 class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
+
+    _prefetched_ = RequestScopedAttribute('prefetched')
+
+    # Records already created in the current request, stored by database id. Laws and offices are usually
+    # referenced by many public law restrictions of a topic.
+    _office_records_ = RequestScopedAttribute('office_records', dict)
+    _article_records_ = RequestScopedAttribute('article_records', dict)
+    _document_records_ = RequestScopedAttribute('document_records', dict)
+    # Records of the bases and refinements already created in the current request, stored by id and level
+    _related_plr_records_ = RequestScopedAttribute('related_plr_records', dict)
+    # Ids of the bases and refinements skipped in the current request because they reference an ancestor
+    _cyclic_plr_references_ = RequestScopedAttribute('cyclic_plr_references', list)
+
     def __init__(self, **kwargs):
         """
         Keyword Arguments:
@@ -36,7 +109,11 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
             language (str): The language this public law restriction is originally shipped with.
             federal (bool): Switch if it is a federal topic. This will be taken into account in processing
                 steps.
-            source (dict): The configuration dictionary of the public law restriction
+            source (dict): The configuration dictionary of the public law restriction. Its params may
+                contain the loader_strategy (selectin, joined or lazy) for the related records,
+                server_side_measures to calculate the intersections with the real estate in the database,
+                subdivide_max_vertices to search the subdivided geometries and max_base_refinement_depth to
+                limit the levels of bases and refinements added to a public law restriction.
             hooks (dict of str): The hook methods: get_symbol, get_symbol_ref. They have to be provided as
                 dotted string for further use with dotted name resolver of pyramid package.
             law_status (dict of str): The multiple match configuration to provide more flexible use of the
@@ -53,33 +130,87 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         BaseDatabaseSource.__init__(self, **bds_kwargs)
         PlrBaseSource.__init__(self, **kwargs)
 
+        self._plr_model = DottedNameResolver().maybe_resolve(
+            '{models_path}.PublicLawRestriction'.format(models_path=models_path)
+        )
         self.legend_entry_model = DottedNameResolver().maybe_resolve(
             '{models_path}.LegendEntry'.format(models_path=models_path)
         )
-        availability_model = DottedNameResolver().maybe_resolve(
+        self._availability_model = DottedNameResolver().maybe_resolve(
             '{models_path}.Availability'.format(models_path=models_path)
         )
-        data_integration_model = DottedNameResolver().maybe_resolve(
+        self._data_integration_model = DottedNameResolver().maybe_resolve(
             '{models_path}.DataIntegration'.format(models_path=models_path)
         )
+        self._server_side_measures = kwargs.get('source').get('params').get('server_side_measures', False)
+        self._max_base_refinement_depth = kwargs.get('source').get('params').get(
+            'max_base_refinement_depth',
+            3
+        )
+        self._subdivided_model = None
+        if kwargs.get('source').get('params').get('subdivide_max_vertices'):
+            try:
+                self._subdivided_model = DottedNameResolver().maybe_resolve(
+                    '{models_path}.SubdividedGeometry'.format(models_path=models_path)
+                )
+            except (ImportError, AttributeError):
+                raise ConfigurationError(
+                    'The models {models_path} of topic {code} do not provide the model SubdividedGeometry '
+                    'needed for subdivide_max_vertices'.format(
+                        models_path=models_path,
+                        code=kwargs.get('code')
+                    )
+                )
+        self._loader_strategy = kwargs.get('source').get('params').get('loader_strategy', 'selectin')
+        if self._loader_strategy not in LOADER_STRATEGIES:
+            raise ConfigurationError(
+                'Unsupported loader strategy "{strategy}" for topic {code}. Use one of: {strategies}'.format(
+                    strategy=self._loader_strategy,
+                    code=kwargs.get('code'),
+                    strategies=', '.join(sorted(LOADER_STRATEGIES.keys()))
+                )
+            )
         self._theme_record = ThemeRecord(self._plr_info.get('code'), self._plr_info.get('text'))
 
         self.availabilities = []
         self.datasource = []
+        self._availability_index = dict()
+        self._data_by_municipality = dict()
+        self._legend_entries = OrderedDict()
+        self._has_geometries = False
+
+        self.refresh()
+
+    def refresh(self):
+        """
+        (Re)loads the availability, data integration and legend entry information of the topic and checks
+        whether the topic contains any geometries. This is done once on initialisation. Since the source
+        instance is shared between requests, the processor calls this method as soon as the data version
+        changes (see :func:`pyramid_oereb.lib.processor.refresh_sources`). It also resets the municipalities
+        known to contain data (see :meth:`has_data_in_municipality`).
+        """
+        availabilities = []
+        availability_index = dict()
+        datasource = []
 
-        session = self._adapter_.get_session(self._key_)
+        session = self._adapter_.get_session(self._key_, read_only=True)
 
         try:
 
-            availabilities_from_db = session.query(availability_model).all()
+            has_geometries = self._query_has_geometries(session)
+
+            availabilities_from_db = session.query(self._availability_model).all()
             for availability in availabilities_from_db:
-                self.availabilities.append(
+                availabilities.append(
                     AvailabilityRecord(availability.fosnr, available=availability.available)
                 )
+                availability_index[int(availability.fosnr)] = availability.available
+
+            legend_entries = self._query_legend_entries(session)
 
-            data_integration = session.query(data_integration_model).all()
+            data_integration = session.query(self._data_integration_model).all()
             for source in data_integration:
-                self.datasource.append(DatasourceRecord(
+                datasource.append(DatasourceRecord(
                     self._theme_record,
                     source.date,
                     OfficeRecord(source.office.name)
@@ -88,13 +219,111 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         finally:
             session.close()
 
+        self.availabilities = availabilities
+        self._availability_index = availability_index
+        self._data_by_municipality = dict()
+        self.datasource = datasource
+        self._legend_entries = legend_entries
+        self._has_geometries = has_geometries
+
+    def _query_legend_entries(self, session):
+        """
+        Loads all legend entries of the topic into an index. The symbols are decoded and their file types
+        are detected once, since the legend entries only change with a data import.
+
+        Args:
+            session (sqlalchemy.orm.Session): The session to use.
+
+        Returns:
+            dict: The lists of IndexedLegendEntry by view service id and type code.
+        """
+        legend_entries = OrderedDict()
+        for legend_entry in session.query(self.legend_entry_model).order_by(self.legend_entry_model.id):
+            symbol = ImageRecord(b64.decode(legend_entry.symbol))
+            try:
+                symbol.extension
+            except TypeError:
+                log.warning('Invalid symbol of legend entry {id} in topic {code}'.format(
+                    id=legend_entry.id,
+                    code=self._plr_info.get('code')
+                ))
+            legend_entries.setdefault((legend_entry.view_service_id, legend_entry.type_code), []).append(
+                IndexedLegendEntry(
+                    symbol,
+                    legend_entry.legend_text,
+                    legend_entry.type_code,
+                    legend_entry.type_code_list,
+                    legend_entry.view_service_id,
+                    legend_entry.sub_theme,
+                    legend_entry.other_theme
+                )
+            )
+        return legend_entries
+
+    def _query_has_geometries(self, session):
+        """
+        Checks if the geometry table of the topic contains at least one row. This uses an EXISTS query which
+        stops at the first row found instead of counting the whole table.
+
+        Args:
+            session (sqlalchemy.orm.Session): The session to use.
+
+        Returns:
+            bool: True if the topic contains geometries.
+        """
+        return session.query(session.query(self._model_).exists()).scalar()
+
+    def _contains_geometries(self, session):
+        """
+        Returns whether the topic contains any geometries. A topic which contained geometries on the last
+        check is not queried again, because querying its geometries is necessary anyway. An empty topic is
+        checked again, so data imported in the meantime is not missed.
+
+        Args:
+            session (sqlalchemy.orm.Session): The session to use.
+
+        Returns:
+            bool: True if the topic contains geometries.
+        """
+        if not self._has_geometries:
+            self._has_geometries = self._query_has_geometries(session)
+        return self._has_geometries
+
+    def get_data_version(self):
+        """
+        Returns the latest data integration date of the topic. It changes with every import of the topic's
+        data.
+
+        Returns:
+            str or None: The data version.
+        """
+        session = self._adapter_.get_session(self._key_, read_only=True)
+        try:
+            version = session.query(func.max(self._data_integration_model.date)).scalar()
+        finally:
+            session.close()
+        return None if version is None else version.isoformat()
+
     def from_db_to_legend_entry_record(self, theme, legend_entries_from_db, public_law_restriction_from_db):
+        """
+        Creates the legend entry records of a public law restriction.
+
+        Args:
+            theme (pyramid_oereb.lib.records.theme.ThemeRecord): The theme of the topic.
+            legend_entries_from_db (list of IndexedLegendEntry): The legend entries of the visible public
+                law restrictions, taken from the legend entry index.
+            public_law_restriction_from_db: The public law restriction from database.
+
+        Returns:
+            list of pyramid_oereb.lib.records.view_service.LegendEntryRecord: The legend entry records
+            of the view service of the public law restriction.
+        """
         legend_entry_records = []
         for legend_entry_from_db in legend_entries_from_db:
             # Filter legend by view service to deliver dedicated legend entries only
             if public_law_restriction_from_db.view_service_id == legend_entry_from_db.view_service_id:
                 legend_entry_records.append(self._legend_entry_record_class(
-                    ImageRecord(b64.decode(legend_entry_from_db.symbol)),
+                    legend_entry_from_db.symbol,
                     legend_entry_from_db.legend_text,
                     legend_entry_from_db.type_code,
                     legend_entry_from_db.type_code_list,
@@ -189,7 +418,21 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
 
         return geometry_records
 
-    def from_db_to_geometry_records(self, geometries_from_db):
+    def from_db_to_geometry_records(self, geometries_from_db, intersection_measures=None):
+        """
+        Creates the geometry records of a public law restriction. Multi geometries and collections are split
+        into one record per part.
+
+        Args:
+            geometries_from_db (list): The geometries from database.
+            intersection_measures (dict or None): The lists of
+                pyramid_oereb.lib.records.geometry.IntersectionMeasures of the parts by geometry id (see
+                :meth:`collect_intersection_measures`). If the geometry column has not been loaded, the
+                records are created from the measures only.
+
+        Returns:
+            list of pyramid_oereb.lib.records.geometry.GeometryRecord: The geometry records.
+        """
         geometry_records = []
         for geometry_from_db in geometries_from_db:
 
@@ -205,53 +448,122 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
             # Create office record
             office = self.from_db_to_office_record(geometry_from_db.responsible_office)
 
+            parts_measures = None
+            if intersection_measures is not None:
+                parts_measures = intersection_measures.get(geometry_from_db.id, [])
+
+            if parts_measures is not None and 'geom' in inspect(geometry_from_db).unloaded:
+                # Create geometry records without geometries from the measures of the parts
+                for part_measures in parts_measures:
+                    geometry_records.append(self._geometry_record_class(
+                        law_status,
+                        geometry_from_db.published_from,
+                        None,
+                        geometry_from_db.geo_metadata,
+                        office=office,
+                        intersection_measures=part_measures
+                    ))
+                continue
+
             # Create geometry records
-            geometry_records.extend(self.create_geometry_records_(
+            part_records = self.create_geometry_records_(
                 law_status,
                 geometry_from_db.published_from,
                 to_shape(geometry_from_db.geom),
                 geometry_from_db.geo_metadata,
                 office
-            ))
+            )
+            if parts_measures is not None and len(parts_measures) == len(part_records):
+                for part_record, part_measures in zip(part_records, parts_measures):
+                    part_record.intersection_measures = part_measures
+            geometry_records.extend(part_records)
 
         return geometry_records
 
     def from_db_to_office_record(self, offices_from_db):
-        office_record = self._office_record_class(
-            offices_from_db.name,
-            offices_from_db.uid,
-            offices_from_db.office_at_web,
-            offices_from_db.line1,
-            offices_from_db.line2,
-            offices_from_db.street,
-            offices_from_db.number,
-            offices_from_db.postal_code,
-            offices_from_db.city
-        )
+        """
+        Creates the office record. Each office is converted only once per request, the record is shared by
+        all public law restrictions, geometries and documents referencing it.
+
+        Args:
+            offices_from_db (sqlalchemy.ext.declarative.DeclarativeMeta): The office from database.
+
+        Returns:
+            pyramid_oereb.lib.records.office.OfficeRecord: The office record.
+        """
+        office_records = self._office_records_
+        office_record = office_records.get(offices_from_db.id)
+        if office_record is None:
+            office_record = self._office_record_class(
+                offices_from_db.name,
+                offices_from_db.uid,
+                offices_from_db.office_at_web,
+                offices_from_db.line1,
+                offices_from_db.line2,
+                offices_from_db.street,
+                offices_from_db.number,
+                offices_from_db.postal_code,
+                offices_from_db.city
+            )
+            office_records[offices_from_db.id] = office_record
         return office_record
 
     def from_db_to_article_records(self, articles_from_db):
+        """
+        Creates the article records. Each article is converted only once per request.
+
+        Args:
+            articles_from_db (list of sqlalchemy.ext.declarative.DeclarativeMeta): The articles from
+                database.
+
+        Returns:
+            list of pyramid_oereb.lib.records.documents.ArticleRecord: The article records.
+        """
         article_records = []
+        known_article_records = self._article_records_
         for article_from_db in articles_from_db:
-            law_status = LawStatusRecord.from_config(
-                Config.get_law_status(
-                    self._plr_info.get('code'),
-                    self._plr_info.get('law_status'),
-                    article_from_db.law_status
+            article_record = known_article_records.get(article_from_db.id)
+            if article_record is None:
+                law_status = LawStatusRecord.from_config(
+                    Config.get_law_status(
+                        self._plr_info.get('code'),
+                        self._plr_info.get('law_status'),
+                        article_from_db.law_status
+                    )
                 )
-            )
-            article_records.append(self._article_record_class(
-                law_status,
-                article_from_db.published_from,
-                article_from_db.number,
-                article_from_db.text_at_web,
-                article_from_db.text
-            ))
+                article_record = self._article_record_class(
+                    law_status,
+                    article_from_db.published_from,
+                    article_from_db.number,
+                    article_from_db.text_at_web,
+                    article_from_db.text
+                )
+                known_article_records[article_from_db.id] = article_record
+            article_records.append(article_record)
         return article_records
 
     def from_db_to_document_records(self, legal_provisions_from_db, article_numbers=None):
+        """
+        Creates the document records including their articles, responsible office and referenced documents.
+        Each document is converted only once per request and set of referenced article numbers.
+
+        Args:
+            legal_provisions_from_db (list of sqlalchemy.ext.declarative.DeclarativeMeta): The documents
+                from database.
+            article_numbers (list or None): The referenced article numbers of each document.
+
+        Returns:
+            list of pyramid_oereb.lib.records.documents.DocumentRecord: The document records.
+        """
         document_records = []
+        known_document_records = self._document_records_
         for i, legal_provision in enumerate(legal_provisions_from_db):
+            article_nrs = article_numbers[i] if isinstance(article_numbers, list) else None
+            key = (legal_provision.id, tuple(article_nrs) if article_nrs else None)
+            document_record = known_document_records.get(key)
+            if document_record is not None:
+                document_records.append(document_record)
+                continue
             referenced_documents_db = []
             referenced_article_numbers = []
             for join in legal_provision.referenced_documents:
@@ -264,7 +576,6 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
             )
             article_records = self.from_db_to_article_records(legal_provision.articles)
             office_record = self.from_db_to_office_record(legal_provision.responsible_office)
-            article_nrs = article_numbers[i] if isinstance(article_numbers, list) else None
             law_status = LawStatusRecord.from_config(
                 Config.get_law_status(
                     self._plr_info.get('code'),
@@ -272,7 +583,7 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
                     legal_provision.law_status
                 )
             )
-            document_records.append(self._documents_record_class(
+            document_record = self._documents_record_class(
                 legal_provision.document_type,
                 law_status,
                 legal_provision.published_from,
@@ -288,10 +599,32 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
                 legal_provision.file,
                 article_records,
                 referenced_document_records
-            ))
+            )
+            known_document_records[key] = document_record
+            document_records.append(document_record)
         return document_records
 
-    def from_db_to_plr_record(self, params, public_law_restriction_from_db, legend_entries_from_db):
+    def from_db_to_plr_record(self, params, public_law_restriction_from_db, legend_entries_from_db,
+                              intersection_measures=None, depth=0, resolving=frozenset()):
+        """
+        Creates the public law restriction record including its bases and refinements.
+
+        Args:
+            params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
+            public_law_restriction_from_db (sqlalchemy.ext.declarative.DeclarativeMeta): The public law
+                restriction from database.
+            legend_entries_from_db (list of IndexedLegendEntry): The legend entries of the visible public
+                law restrictions.
+            intersection_measures (dict or None): The intersection measures of the geometries by geometry
+                id (see :meth:`collect_intersection_measures`).
+            depth (int): The level of the public law restriction as base or refinement. 0 for the public
+                law restrictions found for the real estate.
+            resolving (frozenset): The ids of the public law restrictions referencing this one as base or
+                refinement. They are skipped to prevent cycles.
+
+        Returns:
+            pyramid_oereb.lib.records.plr.PlrRecord: The public law restriction record.
+        """
         thresholds = self._plr_info.get('thresholds')
         min_length = thresholds.get('length').get('limit')
         length_unit = thresholds.get('length').get('unit')
@@ -321,14 +654,24 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         )
 
         document_records = self.get_document_records(params, public_law_restriction_from_db)
-        geometry_records = self.from_db_to_geometry_records(public_law_restriction_from_db.geometries)
-
-        basis_plr_records = []
-        for join in public_law_restriction_from_db.basis:
-            basis_plr_records.append(self.from_db_to_plr_record(params, join.base, []))
-        refinements_plr_records = []
-        for join in public_law_restriction_from_db.refinements:
-            refinements_plr_records.append(self.from_db_to_plr_record(params, join.refinement, []))
+        geometry_records = self.from_db_to_geometry_records(
+            public_law_restriction_from_db.geometries,
+            intersection_measures
+        )
+
+        resolving = resolving | {public_law_restriction_from_db.id}
+        basis_plr_records = self.get_related_plr_records(
+            params,
+            [join.base for join in public_law_restriction_from_db.basis],
+            depth + 1,
+            resolving
+        )
+        refinements_plr_records = self.get_related_plr_records(
+            params,
+            [join.refinement for join in public_law_restriction_from_db.refinements],
+            depth + 1,
+            resolving
+        )
         law_status = LawStatusRecord.from_config(
             Config.get_law_status(
                 self._plr_info.get('code'),
@@ -362,6 +705,56 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
 
         return plr_record
 
+    def get_related_plr_records(self, params, public_law_restrictions_from_db, depth, resolving):
+        """
+        Creates the records of the bases or refinements of a public law restriction. Public law restrictions
+        beyond the configured max_base_refinement_depth or referencing one of their own ancestors are left
+        out. A record is created only once per request and level and shared by all public law restrictions
+        referencing it on this level. Records missing a base or refinement because of a cyclic reference
+        depend on their ancestors and are not shared.
+
+        Args:
+            params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
+            public_law_restrictions_from_db (list of sqlalchemy.ext.declarative.DeclarativeMeta): The
+                bases or refinements from database.
+            depth (int): The level of the bases or refinements.
+            resolving (frozenset): The ids of the public law restrictions currently being created.
+
+        Returns:
+            list of pyramid_oereb.lib.records.plr.PlrRecord: The public law restriction records.
+        """
+        plr_records = []
+        if depth > self._max_base_refinement_depth:
+            return plr_records
+        known_plr_records = self._related_plr_records_
+        cyclic_references = self._cyclic_plr_references_
+        for public_law_restriction_from_db in public_law_restrictions_from_db:
+            if public_law_restriction_from_db.id in resolving:
+                log.warning(u'Skipping cyclic base or refinement with id {id} in topic {topic}'.format(
+                    id=public_law_restriction_from_db.id,
+                    topic=self._plr_info.get('code')
+                ))
+                cyclic_references.append(public_law_restriction_from_db.id)
+                continue
+            key = (public_law_restriction_from_db.id, depth)
+            plr_record = known_plr_records.get(key)
+            if plr_record is None:
+                skipped_before = len(cyclic_references)
+                plr_record = self.from_db_to_plr_record(
+                    params,
+                    public_law_restriction_from_db,
+                    self.get_legend_entries([(
+                        public_law_restriction_from_db.view_service_id,
+                        public_law_restriction_from_db.type_code
+                    )]),
+                    depth=depth,
+                    resolving=resolving
+                )
+                if len(cyclic_references) == skipped_before:
+                    known_plr_records[key] = plr_record
+            plr_records.append(plr_record)
+        return plr_records
+
     def get_document_records(self, params, public_law_restriction_from_db):
         documents_from_db = []
         article_numbers = []
@@ -390,103 +783,330 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
                 representation which is used for comparison.
 
         Returns:
-            sqlalchemy.sql.elements.BooleanClauseList: The clause element.
+            sqlalchemy.sql.elements.BooleanClauseList: The clause element. It combines a bounding box
+            comparison (&&), which can use the spatial index, with the intersection of the extracted parts.
 
         Raises:
             HTTPBadRequest
         """
-        srid = Config.get('srid')
-        sql_text_point = 'ST_Intersects(ST_CollectionExtract({0}, 1), ST_GeomFromText(\'{1}\', {2}))'.format(
-            db_path,
-            real_estate_geometry.wkt,
-            srid
-        )
-        sql_text_line = 'ST_Intersects(ST_CollectionExtract({0}, 2), ST_GeomFromText(\'{1}\', {2}))'.format(
-            db_path,
-            real_estate_geometry.wkt,
-            srid
+        # The geometry is passed as a single bound WKB parameter, so the statement is the same for all
+        # real estates and the geometry is not parsed from the SQL text.
+        geometry = func.ST_GeomFromWKB(
+            bindparam('geometry', real_estate_geometry.wkb, type_=LargeBinary, unique=True),
+            Config.get('srid')
         )
-        sql_text_polygon = 'ST_Intersects(ST_CollectionExtract({0}, 3), ' \
-                           'ST_GeomFromText(\'{1}\', {2}))'.format(
-                                db_path,
-                                real_estate_geometry.wkt,
-                                srid
-                            )
+        collection = literal_column(db_path)
         clause_blocks = [
-            text(sql_text_point),
-            text(sql_text_line),
-            text(sql_text_polygon)
+            func.ST_Intersects(func.ST_CollectionExtract(collection, 1), geometry),
+            func.ST_Intersects(func.ST_CollectionExtract(collection, 2), geometry),
+            func.ST_Intersects(func.ST_CollectionExtract(collection, 3), geometry)
         ]
-        return or_(*clause_blocks)
+        # The extracted parts can not use the spatial index of the column. The bounding box comparison on the
+        # column itself can, so it is used as prefilter.
+        return and_(
+            collection.op('&&', is_comparison=True)(geometry),
+            or_(*clause_blocks)
+        )
+
+    def get_intersection_clause(self, geometry_to_check):
+        """
+        Creates the SQL expression which checks if a geometry of the topic intersects the passed geometry.
+
+        Args:
+            geometry_to_check (shapely.geometry.base.BaseGeometry): The geometry to check against.
 
-    def handle_collection(self, session, geometry_to_check):
+        Returns:
+            sqlalchemy.sql.elements.ClauseElement: The boolean clause element.
+        """
         geometry_types = Config.get('geometry_types')
         collection_types = geometry_types.get('collection').get('types')
         # Check for Geometry type, cause we can't handle geometry collections the same as specific geometries
         if self._plr_info.get('geometry_type') in [x.upper() for x in collection_types]:
 
             # The PLR is defined as a collection type. We need to do a special handling
-            query = session.query(self._model_).filter(
-                self.extract_geometry_collection_db(
-                    '{schema}.{table}.geom'.format(
-                        schema=self._model_.__table__.schema,
-                        table=self._model_.__table__.name
-                    ),
-                    geometry_to_check
-                )
+            return self.extract_geometry_collection_db(
+                '{schema}.{table}.geom'.format(
+                    schema=self._model_.__table__.schema,
+                    table=self._model_.__table__.name
+                ),
+                geometry_to_check
             )
 
-        else:
-            # The PLR is not problematic at all cause we do not have a collection type here
-            query = session.query(self._model_).filter(self._model_.geom.ST_Intersects(
-                from_shape(geometry_to_check, srid=Config.get('srid'))
-            ))
-        return query
+        # The PLR is not problematic at all cause we do not have a collection type here
+        return self._model_.geom.ST_Intersects(
+            from_shape(geometry_to_check, srid=Config.get('srid'))
+        )
+
+    def get_plr_relationships(self):
+        """
+        Returns the relationships of a public law restriction which are eager loaded together with it. This
+        includes the relationships of its basis and refinements.
+
+        Returns:
+            dict: The nested relationship names.
+        """
+        relationships = dict(PLR_RELATIONSHIPS)
+        relationships.update({
+            'basis': {
+                'base': PLR_RELATIONSHIPS
+            },
+            'refinements': {
+                'refinement': PLR_RELATIONSHIPS
+            }
+        })
+        return relationships
 
-    def collect_related_geometries_by_real_estate(self, session, real_estate):
+    def get_loader_options(self, model, relationships, loader=None):
         """
-        Extracts all geometries in the topic which have spatial relation with the passed real estate
+        Creates the loader options to eager load the passed relationships with the configured loader
+        strategy (source parameter loader_strategy). Relationships which do not exist in the model are
+        skipped. If a relationship leads to a polymorphic model, the subclass providing the nested
+        relationships is loaded.
+
+        Args:
+            model (sqlalchemy.ext.declarative.DeclarativeMeta): The model to start with.
+            relationships (dict): The nested relationship names to load.
+            loader (sqlalchemy.orm.Load or None): The loader of the parent relationship.
+
+        Returns:
+            list of sqlalchemy.orm.Load: The loader options.
+        """
+        strategy = LOADER_STRATEGIES.get(self._loader_strategy)
+        if strategy is None:
+            return []
+        if loader is None:
+            loader = Load(model)
+        options = []
+        mapper = inspect(model)
+        for name, nested_relationships in relationships.items():
+            if name not in mapper.relationships:
+                continue
+            target = mapper.relationships[name].mapper
+            attribute = getattr(model, name)
+            for descendant in target.self_and_descendants:
+                if all(nested in descendant.relationships for nested in nested_relationships):
+                    if descendant is not target:
+                        attribute = attribute.of_type(descendant.class_)
+                    target = descendant
+                    break
+            relationship_loader = getattr(loader, strategy)(attribute)
+            options.append(relationship_loader)
+            options.extend(self.get_loader_options(target.class_, nested_relationships, relationship_loader))
+        return options
+
+    def get_bbox_query(self, session, real_estate, bbox):
+        """
+        Creates the query for the public law restrictions in the topic which have spatial relation with the
+        passed bounding box of visible extent. Since the bbox contains the real estate, the same query also
+        flags the public law restrictions intersecting the real estate. This way the geometry table is
+        searched only once per topic. Only the columns needed to find the legend entries are selected, no
+        geometries.
+
+        If the source parameter subdivide_max_vertices is set, the parts of the geometries in the table of the
+        subdivided geometries are searched instead of the geometries themselves. The original geometries
+        are only fetched for the public law restrictions found.
 
         Args:
             session (sqlalchemy.orm.Session): The requested clean session instance ready for use
             real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
                 estate in its record representation.
+            bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
 
         Returns:
-            list: The result of the related geometries unique by the public law restriction id
+            sqlalchemy.orm.query.Query: The query selecting id, type_code, view_service_id and
+            intersects_real_estate of each public law restriction.
         """
-        return self.handle_collection(session, real_estate.limit).distinct(
-            self._model_.public_law_restriction_id
-        ).all()
+        plr_model = self._plr_model
+        if self._subdivided_model is not None:
+            srid = Config.get('srid')
+            parts = self._subdivided_model.geom
+            return session.query(
+                plr_model.id.label('id'),
+                plr_model.type_code.label('type_code'),
+                plr_model.view_service_id.label('view_service_id'),
+                func.bool_or(
+                    parts.ST_Intersects(from_shape(real_estate.limit, srid=srid))
+                ).label('intersects_real_estate')
+            ).select_from(self._subdivided_model).join(
+                self._subdivided_model.geometry
+            ).join(
+                self._model_.public_law_restriction
+            ).filter(
+                parts.ST_Intersects(from_shape(bbox, srid=srid))
+            ).group_by(
+                plr_model.id,
+                plr_model.type_code,
+                plr_model.view_service_id
+            )
+        return session.query(
+            plr_model.id.label('id'),
+            plr_model.type_code.label('type_code'),
+            plr_model.view_service_id.label('view_service_id'),
+            func.bool_or(self.get_intersection_clause(real_estate.limit)).label('intersects_real_estate')
+        ).select_from(self._model_).join(
+            self._model_.public_law_restriction
+        ).filter(
+            self.get_intersection_clause(bbox)
+        ).group_by(
+            plr_model.id,
+            plr_model.type_code,
+            plr_model.view_service_id
+        )
 
-    def collect_legend_entries_by_bbox(self, session, bbox):
+    def collect_plrs_by_bbox(self, session, real_estate, bbox):
         """
-        Extracts all legend entries in the topic which have spatial relation with the passed bounding box of
-        visible extent.
+        Extracts the public law restrictions in the topic which have spatial relation with the passed bounding
+        box of visible extent (see :meth:`get_bbox_query`).
 
         Args:
             session (sqlalchemy.orm.Session): The requested clean session instance ready for use
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
             bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
 
         Returns:
-            list: The result of the related geometries unique by the public law restriction id
+            list: One row per public law restriction with the attributes id, type_code, view_service_id
+            and intersects_real_estate.
         """
-        distinct_type_code_view_service_tuples = []
-        geometries = self.handle_collection(session, bbox).distinct(
-            self._model_.public_law_restriction_id
-        ).all()
-        for geometry in geometries:
-            type_code = geometry.public_law_restriction.type_code
-            view_service_id = geometry.public_law_restriction.view_service_id
-            if (type_code, view_service_id) not in distinct_type_code_view_service_tuples:
-                distinct_type_code_view_service_tuples.append(and_(
-                    self.legend_entry_model.type_code == type_code,
-                    self.legend_entry_model.view_service_id == view_service_id
+        return self.get_bbox_query(session, real_estate, bbox).order_by(self._plr_model.id).all()
+
+    @classmethod
+    def prefetch(cls, plr_sources, real_estate, bbox):
+        """
+        Searches the public law restrictions in the bbox for all passed topics sharing a database connection
+        with a single UNION ALL query. The results are kept in the request context and used by the
+        following :meth:`read` of each topic instead of its own bbox query.
+
+        Args:
+            plr_sources (list of DatabaseSource): The sources which will be read.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+            bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
+        """
+        plr_sources_by_connection = OrderedDict()
+        for plr_source in plr_sources:
+            # Topics without geometries are answered by read() without any bbox query
+            if plr_source._has_geometries and plr_source._is_available(real_estate):
+                plr_sources_by_connection.setdefault(plr_source._key_, []).append(plr_source)
+
+        for key, connection_plr_sources in plr_sources_by_connection.items():
+            session = connection_plr_sources[0]._adapter_.get_session(key, read_only=True)
+            try:
+                queries = []
+                for index, plr_source in enumerate(connection_plr_sources):
+                    # The identifiers are cast to text, because their types may differ between the topics
+                    bbox_query = plr_source.get_bbox_query(session, real_estate, bbox).subquery()
+                    queries.append(session.query(
+                        literal(index).label('source_index'),
+                        cast(bbox_query.c.id, Text).label('id'),
+                        cast(bbox_query.c.type_code, Text).label('type_code'),
+                        cast(bbox_query.c.view_service_id, Text).label('view_service_id'),
+                        bbox_query.c.intersects_real_estate.label('intersects_real_estate')
+                    ))
+                rows = queries[0].union_all(*queries[1:]).all()
+            finally:
+                session.close()
+
+            bbox_results = [[] for _ in connection_plr_sources]
+            for row in rows:
+                plr_source = connection_plr_sources[row.source_index]
+                bbox_results[row.source_index].append(PrefetchedPlr(
+                    plr_source._plr_model.id.type.python_type(row.id),
+                    plr_source._plr_model.type_code.type.python_type(row.type_code),
+                    plr_source._plr_model.view_service_id.type.python_type(row.view_service_id),
+                    row.intersects_real_estate
                 ))
-        return session.query(self.legend_entry_model).filter(
-            or_(*distinct_type_code_view_service_tuples)
+            for plr_source, plr_source_bbox_results in zip(connection_plr_sources, bbox_results):
+                plr_source._prefetched_ = (real_estate, sorted(plr_source_bbox_results))
+
+    def _get_prefetched_bbox_results(self, real_estate):
+        """
+        Returns the results of :meth:`prefetch` for the passed real estate.
+
+        Args:
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+
+        Returns:
+            list of PrefetchedPlr or None: The prefetched results or None if the topic has not been
+            prefetched for the real estate.
+        """
+        if self._prefetched_ is not None and self._prefetched_[0] is real_estate:
+            return self._prefetched_[1]
+        return None
+
+    def collect_intersection_measures(self, session, real_estate, plr_ids):
+        """
+        Calculates the area, length and number of points of the intersection of each geometry part of the
+        passed public law restrictions with the real estate in the database. The parts are the same as the
+        geometry records created from the geometries (ST_Dump). This way the geometries do not have to be
+        intersected in Python for the tolerance check.
+
+        Args:
+            session (sqlalchemy.orm.Session): The requested clean session instance ready for use
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+            plr_ids (list): The ids of the public law restrictions.
+
+        Returns:
+            dict: The lists of pyramid_oereb.lib.records.geometry.IntersectionMeasures of the parts by
+            geometry id.
+        """
+        geometry_types = Config.get('geometry_types')
+        type_names = dict()
+        for key in ['point', 'line', 'polygon']:
+            for type_name in geometry_types.get(key).get('types'):
+                type_names[type_name.upper()] = type_name
+
+        parts = session.query(
+            self._model_.id.label('id'),
+            func.ST_Dump(self._model_.geom).path.label('path'),
+            func.GeometryType(func.ST_Dump(self._model_.geom).geom).label('geom_type'),
+            func.ST_Intersection(
+                func.ST_Dump(self._model_.geom).geom,
+                from_shape(real_estate.limit, srid=Config.get('srid'))
+            ).label('intersection')
+        ).filter(
+            self._model_.public_law_restriction_id.in_(plr_ids)
+        ).subquery()
+        rows = session.query(
+            parts.c.id,
+            parts.c.geom_type,
+            func.ST_Area(func.ST_CollectionExtract(parts.c.intersection, 3)).label('area'),
+            func.ST_Length(func.ST_CollectionExtract(parts.c.intersection, 2)).label('length'),
+            func.ST_NPoints(func.ST_CollectionExtract(parts.c.intersection, 1)).label('nr_of_points')
+        ).order_by(
+            parts.c.id,
+            parts.c.path
         ).all()
 
+        intersection_measures = dict()
+        for row in rows:
+            intersection_measures.setdefault(row.id, []).append(IntersectionMeasures(
+                type_names.get(row.geom_type, row.geom_type),
+                row.area,
+                row.length,
+                row.nr_of_points
+            ))
+        return intersection_measures
+
+    def get_legend_entries(self, view_service_type_code_tuples):
+        """
+        Looks up the legend entries matching the passed view services and type codes in the legend entry
+        index of the topic. No database query is needed.
+
+        Args:
+            view_service_type_code_tuples (list of tuple): The view service ids and type codes.
+
+        Returns:
+            list of IndexedLegendEntry: The legend entries matching view service and type code of the
+            public law restrictions.
+        """
+        legend_entries = []
+        for key in OrderedDict.fromkeys(view_service_type_code_tuples):
+            legend_entries.extend(self._legend_entries.get(key, []))
+        return legend_entries
+
     def read(self, params, real_estate, bbox, position=None):
         """
         The read point which creates a extract, depending on a passed real estate.
@@ -497,43 +1117,75 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
                 estate in its record representation.
             bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
             position (int or None): relative position of the plr (within a list of plrs)
+
+        Returns:
+            list of pyramid_oereb.lib.records.plr.EmptyPlrRecord: The public law restriction records.
         """
         log.debug("read() start; position of theme in theme list: {}".format(position))
         self._theme_record.position = position
 
         # Check if the plr is marked as available
         if self._is_available(real_estate):
-            session = self._adapter_.get_session(self._key_)
+            session = self._adapter_.get_session(self._key_, read_only=True)
             try:
-                if session.query(self._model_).count() == 0:
+                prefetched_bbox_results = self._get_prefetched_bbox_results(real_estate)
+                if prefetched_bbox_results is None and not self._contains_geometries(session):
                     # We can stop here already because there are no items in the database
-                    self.records = [EmptyPlrRecord(self._theme_record)]
+                    records = [EmptyPlrRecord(self._theme_record)]
                 else:
                     # We need to investigate more in detail
 
-                    # Try to find geometries which have spatial relation with real estate
-                    geometry_results = self.collect_related_geometries_by_real_estate(
-                        session, real_estate
-                    )
-                    if len(geometry_results) == 0:
+                    # Find public law restrictions in the bbox and which of them have spatial relation with
+                    # the real estate
+                    if prefetched_bbox_results is None:
+                        bbox_results = self.collect_plrs_by_bbox(session, real_estate, bbox)
+                    else:
+                        bbox_results = prefetched_bbox_results
+                    related_plr_ids = [
+                        bbox_result.id for bbox_result in bbox_results if bbox_result.intersects_real_estate
+                    ]
+                    if len(related_plr_ids) == 0:
                         # We checked if there are spatially related elements in database. But there is none.
                         # So we can stop here.
-                        self.records = [EmptyPlrRecord(self._theme_record)]
+                        records = [EmptyPlrRecord(self._theme_record)]
                     else:
                         # We found spatially related elements. This means we need to extract the actual plr
                         # information related to the found geometries.
-                        self.records = []
-                        legend_entries_from_db = self.collect_legend_entries_by_bbox(session, bbox)
-                        for geometry_result in geometry_results:
-                            self.records.append(
+                        records = []
+                        legend_entries_from_db = self.get_legend_entries([
+                            (bbox_result.view_service_id, bbox_result.type_code)
+                            for bbox_result in bbox_results
+                        ])
+                        loader_options = self.get_loader_options(
+                            self._plr_model,
+                            self.get_plr_relationships()
+                        )
+                        intersection_measures = None
+                        if self._server_side_measures:
+                            intersection_measures = self.collect_intersection_measures(
+                                session, real_estate, related_plr_ids
+                            )
+                            if not params.with_geometry:
+                                # The measures replace the geometries for the tolerance check
+                                loader_options.append(Load(self._plr_model).defaultload(
+                                    self._plr_model.geometries
+                                ).defer(self._model_.geom))
+                        public_law_restrictions = session.query(self._plr_model).options(
+                            *loader_options
+                        ).filter(
+                            self._plr_model.id.in_(related_plr_ids)
+                        ).order_by(self._plr_model.id).all()
+                        for public_law_restriction in public_law_restrictions:
+                            records.append(
                                 self.from_db_to_plr_record(
                                     params,
-                                    geometry_result.public_law_restriction,
-                                    legend_entries_from_db
+                                    public_law_restriction,
+                                    legend_entries_from_db,
+                                    intersection_measures=intersection_measures
                                 )
                             )
-                        log.debug("read() processed {} geometry_results into {} plr".format(
-                            len(geometry_results), len(self.records))
+                        log.debug("read() processed {} public law restrictions into {} plr".format(
+                            len(public_law_restrictions), len(records))
                         )
 
             finally:
@@ -541,11 +1193,14 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
 
         # Add empty record if topic is not available
         else:
-            self.records = [EmptyPlrRecord(self._theme_record, has_data=False)]
+            records = [EmptyPlrRecord(self._theme_record, has_data=False)]
+
+        return records
 
     def _is_available(self, real_estate):
         """
-        Checks if the topic is available for the specified real estate.
+        Checks if the topic is available for the specified real estate. The availabilities are indexed by
+        fosnr, so the municipality record can be passed as well.
 
         Args:
             real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
@@ -554,7 +1209,33 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         Returns:
              bool: True if the topic is available, false otherwise.
         """
-        for availability in self.availabilities:
-            if int(real_estate.fosnr) == int(availability.fosnr) and not availability.available:
-                return False
-        return True
+        return self._availability_index.get(int(real_estate.fosnr), True)
+
+    def has_data_in_municipality(self, municipality):
+        """
+        Checks if the topic contains geometries within the municipality. The result is stored per municipality
+        until the next :meth:`refresh` after an import, so the database is queried only once per municipality
+        and data version. Empty topics, municipalities without geometry and municipalities for which the topic
+        is not available are not checked, they are left to :meth:`read`.
+
+        Args:
+            municipality (pyramid_oereb.lib.records.municipality.MunicipalityRecord): The municipality
+                of the real estate.
+
+        Returns:
+            bool: False if the topic contains no geometries within the municipality.
+        """
+        if not self._has_geometries or municipality.geom is None or not self._is_available(municipality):
+            return True
+        fosnr = int(municipality.fosnr)
+        has_data = self._data_by_municipality.get(fosnr)
+        if has_data is None:
+            session = self._adapter_.get_session(self._key_, read_only=True)
+            try:
+                has_data = session.query(session.query(self._model_).filter(
+                    self.get_intersection_clause(wkt.loads(municipality.geom))
+                ).exists()).scalar()
+            finally:
+                session.close()
+            self._data_by_municipality[fosnr] = has_data
+        return has_data
@@ -21,16 +21,18 @@ class DatabaseSource(BaseDatabaseSource, RealEstateBaseSource):
             number (str or None): The number of parcel or also known real estate. This parameter
                 is directly related to the nb_ident parameter and both must be set!
                 Combination will deliver only one result or crashes.
-            (str or None): The unique identifier of the desired real estate. This will deliver
-                only one result or crashes.
+            egrid (str or list of str or None): The unique identifier of the desired real estate. This will
+                deliver only one result or crashes. A list of identifiers delivers one result per identifier.
             geometry (str): A geometry as WKT string which is used to obtain intersected real
                 estates. This may deliver several results.
         """
-        session = self._adapter_.get_session(self._key_)
+        session = self._adapter_.get_session(self._key_, read_only=True)
         try:
             query = session.query(self._model_)
             if nb_ident and number:
                 results = query.filter(self._model_.number == number, self._model_.identdn == nb_ident).all()
+            elif egrid and isinstance(egrid, (list, tuple, set)):
+                results = query.filter(self._model_.egrid.in_(egrid)).all()
             elif egrid:
                 results = query.filter(self._model_.egrid == egrid).all()
             elif geometry:
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from sqlalchemy import func, select
+
+
+def get_subdivide_statements(models, max_vertices):
+    """
+    Creates the statements which fill the table of the subdivided geometries (model SubdividedGeometry)
+    from the geometries of a topic. Existing parts are deleted first.
+
+    Args:
+        models (module): The module containing the models of the topic.
+        max_vertices (int): The maximum number of vertices of a part (see ST_Subdivide).
+
+    Returns:
+        list of sqlalchemy.sql.expression.Executable: The statements to be executed in this order.
+    """
+    geometry_model = models.Geometry
+    subdivided_model = models.SubdividedGeometry
+    parts = select([
+        geometry_model.id,
+        func.ST_Subdivide(geometry_model.geom, max_vertices)
+    ])
+    return [
+        subdivided_model.__table__.delete(),
+        subdivided_model.__table__.insert().from_select(
+            [subdivided_model.geometry_id, subdivided_model.geom],
+            parts
+        )
+    ]
@@ -17,6 +17,7 @@ from sqlalchemy.orm import sessionmaker
 from tqdm import tqdm
 
 from pyramid_oereb.lib.config import Config
+from pyramid_oereb.standard.subdivide_geometries import get_subdivide_statements
 from pyramid_oereb.standard.xtf_import.article import Article
 from pyramid_oereb.standard.xtf_import.base_refinement import BaseRefinement
 from pyramid_oereb.standard.xtf_import.document import Document
@@ -91,6 +92,9 @@ class FederalTopic(object):
         self._connection = topic_settings.get('source').get('params').get('db_connection')
         models_path = topic_settings.get('source').get('params').get('models')
         self._models = DottedNameResolver().maybe_resolve(models_path)
+        self._subdivide_max_vertices = topic_settings.get('source').get('params').get(
+            'subdivide_max_vertices'
+        )
         self._file_id = '{0}'.format(uuid4())
         self._checksum = None
         self._data_integration_office_id = None
@@ -130,6 +134,9 @@ class FederalTopic(object):
 
                 self._update_data_integration(session, topic_source)
 
+                if self._subdivide_max_vertices:
+                    self._subdivide_geometries(session)
+
                 self._log.info('Committing import')
                 session.commit()
 
@@ -205,6 +212,20 @@ class FederalTopic(object):
                 table=model.__table__.name
             ))
 
+    def _subdivide_geometries(self, session):
+        """
+        Fills the table of the subdivided geometries with the imported geometries.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): The SQLAlchemy session for database interaction.
+        """
+        self._log.info('Subdividing geometries with a maximum of {0} vertices'.format(
+            self._subdivide_max_vertices
+        ))
+        session.flush()
+        for statement in get_subdivide_statements(self._models, self._subdivide_max_vertices):
+            session.execute(statement)
+
     def _update_data_integration(self, session, topic_source):
         """
         Update the table `data_integration` with the data of the current import.
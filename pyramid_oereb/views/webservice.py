@@ -1,18 +1,24 @@
 # -*- coding: utf-8 -*-
 
+import copy
+import json
 import logging
 
-from pyramid.httpexceptions import HTTPBadRequest, HTTPNoContent, HTTPNotFound, HTTPInternalServerError
+from pyramid.httpexceptions import HTTPBadRequest, HTTPNoContent, HTTPNotFound, HTTPInternalServerError, \
+    HTTPNotModified
 from pyramid.path import DottedNameResolver
 from shapely.geometry import Point
-from pyramid.renderers import render_to_response
+from pyramid.renderers import render, render_to_response
 from pyramid.response import Response
+from webob.etag import AnyETag
 
-from pyramid_oereb import route_prefix
+from pyramid_oereb import database_adapter, route_prefix
 from pyramid_oereb import Config
 from pyreproj import Reprojector
 
-from pyramid_oereb.lib.processor import create_processor
+from pyramid_oereb.lib.adapter import query_scope
+from pyramid_oereb.lib.context import activate_request_context, release_request_context
+from pyramid_oereb.lib.processor import get_processor
 from pyramid_oereb.lib.readers.address import AddressReader
 from timeit import default_timer as timer
 
@@ -20,6 +26,9 @@ from pyramid_oereb.contrib.stats.decorators import OerebStats
 
 log = logging.getLogger(__name__)
 
+BATCH_CHUNK_SIZE = 100
+"""int: Number of real estates read with one query by the batch extract."""
+
 
 class PlrWebservice(object):
     """
@@ -104,7 +113,7 @@ class PlrWebservice(object):
                 'Code': theme.code,
                 'Text': text
             })
-        processor = create_processor()
+        processor = get_processor()
         capabilities = {
             u'GetCapabilitiesResponse': {
                 u'topic': themes,
@@ -146,7 +155,7 @@ class PlrWebservice(object):
                                                self.__parse_xy__(xy, buffer_dist=1.0).wkt)
                 elif gnss:
                     geom_wkt = geom_wkt.format(Config.get('srid'), self.__parse_gnss__(gnss).wkt)
-                processor = create_processor()
+                processor = get_processor()
                 records = processor.real_estate_reader.read(params, **{'geometry': geom_wkt})
                 response = self.__get_egrid_response__(records)
             else:
@@ -172,7 +181,7 @@ class PlrWebservice(object):
         number = self._request.matchdict.get('number')
         try:
             if identdn and number:
-                processor = create_processor()
+                processor = get_processor()
                 records = processor.real_estate_reader.read(
                     params,
                     **{
@@ -214,7 +223,7 @@ class PlrWebservice(object):
                     raise HTTPNoContent()
                 geometry = 'SRID={srid};{wkt}'.format(srid=Config.get('srid'),
                                                       wkt=addresses[0].geom.wkt)
-                processor = create_processor()
+                processor = get_processor()
                 records = processor.real_estate_reader.read(params, **{'geometry': geometry})
                 response = self.__get_egrid_response__(records)
             else:
@@ -238,55 +247,31 @@ class PlrWebservice(object):
         """
         start_time = timer()
         log.debug("get_extract_by_id() start")
+        degraded_topics = None
         try:
             params = self.__validate_extract_params__()
-            processor = create_processor()
-            # read the real estate from configured source by the passed parameters
-            real_estate_reader = processor.real_estate_reader
-            if params.egrid:
-                real_estate_records = real_estate_reader.read(params, egrid=params.egrid)
-            elif params.identdn and params.number:
-                real_estate_records = real_estate_reader.read(
-                    params,
-                    nb_ident=params.identdn,
-                    number=params.number
-                )
-            else:
-                raise HTTPBadRequest("Missing required argument")
-            # check if result is strictly one (we queried with primary keys)
-            if len(real_estate_records) == 1:
-                extract = processor.process(
-                    real_estate_records[0],
-                    params,
-                    self._request.route_url('{0}/sld'.format(route_prefix))
-                )
-                if params.format == 'json':
-                    log.debug("get_extract_by_id() calling json")
-                    response = render_to_response(
-                        'pyramid_oereb_extract_json',
-                        (extract, params),
-                        request=self._request
-                    )
-                elif params.format == 'xml':
-                    log.debug("get_extract_by_id() calling xml")
-                    response = render_to_response(
-                        'pyramid_oereb_extract_xml',
-                        (extract, params),
-                        request=self._request
-                    )
-                elif params.format == 'pdf':
-                    log.debug("get_extract_by_id() calling pdf")
-                    response = render_to_response(
-                        'pyramid_oereb_extract_print',
-                        (extract, params),
-                        request=self._request
-                    )
-                else:
-                    raise HTTPBadRequest("The format '{}' is wrong".format(params.format))
-                end_time = timer()
-                log.debug("DONE with extract, time spent: {} seconds".format(end_time - start_time))
+            processor = get_processor()
+            response_cache = processor.response_cache
+            response = None
+            etag = None
+            if response_cache is not None:
+                etag = response_cache.key(*self.__get_extract_cache_key_parts__(params))
+            if etag is not None:
+                response = self.__get_cached_extract_response__(response_cache, etag)
+            if response is None:
+                response = self.__create_extract_response__(processor, params)
+                degraded_topics = processor.extract_reader.degraded_topics or None
+                # Incomplete extracts (degraded topics) or failed print requests are not cached
+                if etag is not None and degraded_topics is None and response.status_code == 200:
+                    response.etag = etag
+                    self.__set_cached_extract_response__(response_cache, etag, response)
             else:
-                raise HTTPNoContent("No real estate found")
+                log.debug("get_extract_by_id() returning cached response")
+            end_time = timer()
+            log.debug("DONE with extract, time spent: {} seconds".format(end_time - start_time))
+            log.debug("Statements executed for the extract: {}".format(
+                getattr(self._request, 'query_statistics', None)
+            ))
         except HTTPNoContent as err:
             response = HTTPNoContent('{}'.format(err))
         except HTTPBadRequest as err:
@@ -294,7 +279,9 @@ class PlrWebservice(object):
         try:
             response.extras = OerebStats(service='GetExtractById',
                                          output_format=params.format,
-                                         params=vars(params))
+                                         params=vars(params),
+                                         degraded_topics=degraded_topics,
+                                         query_statistics=getattr(self._request, 'query_statistics', None))
         except UnboundLocalError:
             response.extras = OerebStats(service='GetExtractById', params={'error': response.message})
         except Exception:
@@ -307,6 +294,278 @@ class PlrWebservice(object):
                 response.extras = OerebStats(service='GetExtractById')
         return response
 
+    def get_extract_batch(self):
+        """
+        Returns the extracts of several real estates in one response. The EGRIDs are posted as JSON list
+        (or as object containing the list as "egrids"). The extracts are processed by the shared processor
+        and streamed back in JSON format, one line per EGRID. Real estates which cannot be processed are
+        reported by a line containing the EGRID and the error.
+
+        Returns:
+            pyramid.response.Response: The `extract_batch` response.
+        """
+        log.debug("get_extract_batch() start")
+        try:
+            params = self.__validate_extract_params__()
+            if not params.with_geometry and self._request.matchdict.get('param1'):
+                raise HTTPBadRequest('The EGRIDs of the batch extract have to be posted in the request body.')
+            if params.format != 'json':
+                raise HTTPBadRequest('The batch extract is only available for format JSON.')
+            egrids = self.__validate_batch_egrids__()
+            response = Response(
+                app_iter=self.__generate_extract_batch__(get_processor(), params, egrids),
+                content_type='application/x-ndjson',
+                charset='UTF-8'
+            )
+            response.extras = OerebStats(service='GetExtractBatch',
+                                         output_format=params.format,
+                                         params={'egrids': len(egrids)})
+        except HTTPBadRequest as err:
+            response = HTTPBadRequest('{}'.format(err))
+            response.extras = OerebStats(service='GetExtractBatch', params={'error': response.message})
+        return response
+
+    def __validate_batch_egrids__(self):
+        """
+        Validates the list of EGRIDs posted to the batch extract.
+
+        Returns:
+            list of str: The EGRIDs without duplicates in the posted order.
+        """
+        try:
+            body = self._request.json_body
+        except ValueError:
+            raise HTTPBadRequest('The request body has to be a JSON list of EGRIDs.')
+        if isinstance(body, dict):
+            body = body.get('egrids')
+        if not isinstance(body, list) or len(body) == 0 or \
+                not all(isinstance(egrid, str) for egrid in body):
+            raise HTTPBadRequest('The request body has to be a JSON list of EGRIDs.')
+        max_size = Config.get('extract').get('batch_max_size', 1000)
+        if len(body) > max_size:
+            raise HTTPBadRequest('The batch extract is limited to {0} EGRIDs.'.format(max_size))
+        egrids = list()
+        for egrid in body:
+            if egrid not in egrids:
+                egrids.append(egrid)
+        return egrids
+
+    def __generate_extract_batch__(self, processor, params, egrids):
+        """
+        Processes and renders the extracts of the batch. The real estates are read chunk wise with one
+        query per chunk.
+
+        The generator is consumed as body of the response, after the request has been finished and its
+        request context and sessions have been released. Reading a chunk and processing an extract therefore
+        run in a request context of their own with shared sessions (see :meth:`__in_request_context__`),
+        which is released before the line is passed on.
+
+        Args:
+            processor (pyramid_oereb.lib.processor.Processor): The shared processor.
+            params (pyramid_oereb.views.webservice.Parameter): The validated parameters.
+            egrids (list of str): The EGRIDs to process.
+
+        Returns:
+            generator of bytes: The rendered extracts, one line per EGRID.
+        """
+        sld_url = self._request.route_url('{0}/sld'.format(route_prefix))
+        for i in range(0, len(egrids), BATCH_CHUNK_SIZE):
+            chunk = egrids[i:i + BATCH_CHUNK_SIZE]
+            records = self.__in_request_context__(self.__read_batch_real_estates__, processor, params, chunk)
+            real_estates = dict((record.egrid, record) for record in records)
+            for egrid in chunk:
+                real_estate = real_estates.get(egrid)
+                if real_estate is None:
+                    line = json.dumps({'egrid': egrid, 'error': 'No real estate found'})
+                else:
+                    line = self.__in_request_context__(
+                        self.__render_batch_extract__, processor, params, egrid, real_estate, sld_url
+                    )
+                yield line.encode('utf-8') + b'\n'
+
+    def __in_request_context__(self, function, *args):
+        """
+        Calls the function in a new request context with its own shared sessions. The statements executed
+        are added to the query statistics of the request.
+
+        Args:
+            function (callable): The function to call.
+            *args: The arguments of the function.
+
+        Returns:
+            *: The result of the function.
+        """
+        activate_request_context()
+        try:
+            request_sessions = database_adapter.begin_request()
+            database_adapter.begin_query_statistics(getattr(self._request, 'query_statistics', None))
+            try:
+                return function(*args)
+            finally:
+                database_adapter.release_sessions(request_sessions)
+        finally:
+            release_request_context()
+
+    @staticmethod
+    def __read_batch_real_estates__(processor, params, egrids):
+        """
+        Reads the real estates of a chunk of the batch.
+
+        Args:
+            processor (pyramid_oereb.lib.processor.Processor): The shared processor.
+            params (pyramid_oereb.views.webservice.Parameter): The validated parameters.
+            egrids (list of str): The EGRIDs of the chunk.
+
+        Returns:
+            list of pyramid_oereb.lib.records.real_estate.RealEstateRecord: The real estates found.
+        """
+        with query_scope('real_estate'):
+            return processor.real_estate_reader.read(params, egrid=egrids)
+
+    def __render_batch_extract__(self, processor, params, egrid, real_estate, sld_url):
+        """
+        Processes and renders the extract of a real estate of the batch.
+
+        Args:
+            processor (pyramid_oereb.lib.processor.Processor): The shared processor.
+            params (pyramid_oereb.views.webservice.Parameter): The validated parameters.
+            egrid (str): The EGRID of the real estate.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate.
+            sld_url (str): The URL of the SLD to highlight the real estate.
+
+        Returns:
+            str: The rendered extract or the error as JSON.
+        """
+        try:
+            extract_params = copy.copy(params)
+            extract_params.set_egrid(egrid)
+            extract = processor.process(real_estate, extract_params, sld_url)
+            return render(
+                'pyramid_oereb_extract_json',
+                (extract, extract_params),
+                request=self._request
+            )
+        except Exception as err:
+            log.exception('Batch extract failed for {0}'.format(egrid))
+            return json.dumps({'egrid': egrid, 'error': '{0}'.format(err)})
+
+    def __create_extract_response__(self, processor, params):
+        """
+        Reads the real estate, processes its extract and renders it in the requested format.
+
+        Args:
+            processor (pyramid_oereb.lib.processor.Processor): The processor.
+            params (pyramid_oereb.views.webservice.Parameter): The validated parameters.
+
+        Returns:
+            pyramid.response.Response: The rendered extract.
+        """
+        # read the real estate from configured source by the passed parameters
+        real_estate_reader = processor.real_estate_reader
+        with query_scope('real_estate'):
+            if params.egrid:
+                real_estate_records = real_estate_reader.read(params, egrid=params.egrid)
+            elif params.identdn and params.number:
+                real_estate_records = real_estate_reader.read(
+                    params,
+                    nb_ident=params.identdn,
+                    number=params.number
+                )
+            else:
+                raise HTTPBadRequest("Missing required argument")
+        # check if result is strictly one (we queried with primary keys)
+        if len(real_estate_records) != 1:
+            raise HTTPNoContent("No real estate found")
+        extract = processor.process(
+            real_estate_records[0],
+            params,
+            self._request.route_url('{0}/sld'.format(route_prefix))
+        )
+        if params.format == 'json':
+            log.debug("get_extract_by_id() calling json")
+            renderer = 'pyramid_oereb_extract_json'
+        elif params.format == 'xml':
+            log.debug("get_extract_by_id() calling xml")
+            renderer = 'pyramid_oereb_extract_xml'
+        elif params.format == 'pdf':
+            log.debug("get_extract_by_id() calling pdf")
+            renderer = 'pyramid_oereb_extract_print'
+        else:
+            raise HTTPBadRequest("The format '{}' is wrong".format(params.format))
+        return render_to_response(renderer, (extract, params), request=self._request)
+
+    def __get_extract_cache_key_parts__(self, params):
+        """
+        Returns the values identifying a rendered extract. The real estate is identified by the request
+        parameters, so the key can be computed without reading anything from the database. The application
+        URL is part of the key, because the rendered extract contains links to this application.
+
+        Args:
+            params (pyramid_oereb.views.webservice.Parameter): The validated parameters.
+
+        Returns:
+            tuple: The parts of the cache key.
+        """
+        topics = params.topics
+        if isinstance(topics, (list, tuple, set)):
+            topics = u','.join(sorted(topics))
+        return (
+            params.egrid,
+            params.identdn,
+            params.number,
+            params.format,
+            params.flavour,
+            params.language,
+            topics,
+            params.images,
+            params.with_geometry,
+            self._request.application_url
+        )
+
+    def __get_cached_extract_response__(self, response_cache, etag):
+        """
+        Returns the response for an extract which has already been rendered with the current data. The cached
+        response is delivered unchanged, including the identifier and creation date of the extract, like the
+        extracts of the extract cache (see :meth:`pyramid_oereb.lib.processor.Processor.process`).
+
+        Args:
+            response_cache (pyramid_oereb.lib.cache.VersionedCache): The cache for rendered extracts.
+            etag (str): The entity tag of the requested extract, which is also its cache key.
+
+        Returns:
+            pyramid.response.Response or None: A `304 Not Modified` response if the client already holds
+            the extract, the cached response or None if the extract has to be rendered.
+        """
+        cached = response_cache.get(etag)
+        if_none_match = self._request.if_none_match
+        if if_none_match is AnyETag:
+            # "*" matches any existing extract, but the real estate is only known to exist if its extract has
+            # been rendered before
+            if cached is not None:
+                return HTTPNotModified(etag=etag)
+        elif etag in if_none_match:
+            return HTTPNotModified(etag=etag)
+        if cached is None:
+            return None
+        headerlist, body = cached
+        return Response(body=body, headerlist=list(headerlist))
+
+    @staticmethod
+    def __set_cached_extract_response__(response_cache, etag, response):
+        """
+        Stores the body and the entity headers of a rendered extract.
+
+        Args:
+            response_cache (pyramid_oereb.lib.cache.VersionedCache): The cache for rendered extracts.
+            etag (str): The entity tag of the extract, which is also its cache key.
+            response (pyramid.response.Response): The rendered extract.
+        """
+        headerlist = [
+            (name, value) for name, value in response.headerlist
+            if name.lower() not in ('content-length', 'transfer-encoding', 'connection', 'set-cookie')
+        ]
+        response_cache.set(etag, (headerlist, response.body))
+
     def __validate_extract_params__(self):
         """
         Validates the input parameters for get_extract_by_id.
@@ -326,7 +585,7 @@ class PlrWebservice(object):
         # With geometry?
         with_geometry = False
         user_requested_geometry = False
-        if self._request.matchdict.get('param1').lower() == 'geometry':
+        if (self._request.matchdict.get('param1') or '').lower() == 'geometry':
             with_geometry = True
             user_requested_geometry = True
 
@@ -773,6 +1032,35 @@ class Symbol(object):
         raise HTTPNotFound()
 
 
+class Metrics(object):
+    """
+    Webservice to deliver the state of the database connection pools and the statistics of the executed
+    statements of this process.
+
+    Args:
+        request (pyramid.request.Request or pyramid.testing.DummyRequest): The pyramid request instance.
+    """
+    def __init__(self, request):
+        self._request_ = request
+
+    def get_metrics(self):
+        """
+        Returns the pool status (see :meth:`pyramid_oereb.lib.adapter.DatabaseAdapter.get_pool_status`) and
+        the statement statistics per topic (see
+        :meth:`pyramid_oereb.lib.adapter.DatabaseAdapter.get_query_statistics`) in JSON format.
+
+        Returns:
+            pyramid.response.Response: The `metrics` response.
+        """
+        metrics = {
+            u'pools': database_adapter.get_pool_status(),
+            u'queries': database_adapter.get_query_statistics()
+        }
+        response = render_to_response('json', metrics, request=self._request_)
+        response.content_type = 'application/json; charset=UTF-8'
+        return response
+
+
 class Sld(object):
     """
     Webservice to deliver a valid sld content to filter a av base layer to only one dedicated real estate.
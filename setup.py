@@ -55,7 +55,9 @@ setup(
             'drop_standard_tables = pyramid_oereb.standard.drop_tables:drop_standard_tables',
             'create_legend_entries = pyramid_oereb.standard.load_legend_entries:run',
             'import_federal_topic = pyramid_oereb.standard.import_federal_topic:run',
-            'create_stats_tables = pyramid_oereb.contrib.stats.scripts.create_stats_tables:create_stats_tables'  # noqa: E501
+            'generate_extracts = pyramid_oereb.standard.generate_extracts:run',
+            'create_stats_tables = pyramid_oereb.contrib.stats.scripts.create_stats_tables:create_stats_tables',  # noqa: E501
+            'warm_up_cache = pyramid_oereb.contrib.stats.scripts.warm_up_cache:warm_up_cache'
         ]
     }
 )
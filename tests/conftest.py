@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from pyramid_oereb.lib.context import activate_request_context, release_request_context
+
+
+@pytest.fixture(autouse=True)
+def request_context():
+    """
+    Runs every test in a request context of its own, like a request or script using the readers and sources.
+    """
+    context = activate_request_context()
+    yield context
+    release_request_context()
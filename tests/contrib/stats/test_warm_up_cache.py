@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from pyramid_oereb.contrib.stats.scripts.warm_up_cache import warm_up
+
+
+def test_warm_up():
+    sent = []
+
+    def send(path, parameters):
+        sent.append((path, parameters))
+        if path.endswith('FAILING'):
+            raise IOError('Connection refused')
+        return 204 if path.endswith('MISSING') else 200
+
+    hot_requests = [
+        ('/oereb/extract/reduced/json/CH1', {'LANG': 'de'}, 10),
+        ('/oereb/extract/reduced/json/MISSING', {}, 5),
+        ('/oereb/extract/reduced/xml/FAILING', {}, 2),
+        ('/oereb/extract/reduced/xml/CH1', {}, 1)
+    ]
+    assert warm_up(hot_requests, send) == 2
+    assert sent[0] == ('/oereb/extract/reduced/json/CH1', {'LANG': 'de'})
+    assert len(sent) == 4
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from pyramid_oereb.lib.context import activate_request_context
+from shapely.geometry import MultiPolygon, Polygon
+from sqlalchemy.exc import OperationalError
+
+from pyramid_oereb.lib.readers.extract import ExtractReader
+from pyramid_oereb.lib.records.image import ImageRecord
+from pyramid_oereb.lib.records.municipality import MunicipalityRecord
+from pyramid_oereb.lib.records.office import OfficeRecord
+from pyramid_oereb.lib.records.plr import EmptyPlrRecord
+from pyramid_oereb.lib.records.real_estate import RealEstateRecord
+from pyramid_oereb.lib.sources.plr import PlrBaseSource
+from tests.mockrequest import MockParameter
+
+
+class DelayedSource(PlrBaseSource):
+    def __init__(self, code, delay):
+        super(DelayedSource, self).__init__(code=code)
+        self._delay = delay
+        self.threads = []
+
+    def read(self, params, real_estate, bbox, position=None):
+        time.sleep(self._delay)
+        self.threads.append(threading.current_thread())
+        return [(self.info.get('code'), position)]
+
+
+class LegacySource(PlrBaseSource):
+    def read(self, params, real_estate, bbox, position=None):
+        self.records = [(self.info.get('code'), position)]
+
+
+def _sources():
+    return [
+        (1, DelayedSource('first', 0.2)),
+        (2, DelayedSource('second', 0.0)),
+        (3, LegacySource(code='third'))
+    ]
+
+
+def test_read_plr_sources_sequential():
+    activate_request_context()
+    reader = ExtractReader([], OfficeRecord({'de': 'Test'}))
+    sources = _sources()
+    results = reader._read_plr_sources_(sources, MockParameter(), None, None)
+    assert results == [[('first', 1)], [('second', 2)], [('third', 3)]]
+    assert sources[0][1].threads == [threading.current_thread()]
+
+
+def test_read_plr_sources_thread_pool():
+    activate_request_context()
+    reader = ExtractReader([], OfficeRecord({'de': 'Test'}), max_workers=3)
+    sources = _sources()
+    results = reader._read_plr_sources_(sources, MockParameter(), None, None)
+    # Results are merged in the configured order, not in the order of completion
+    assert results == [[('first', 1)], [('second', 2)], [('third', 3)]]
+    assert sources[0][1].threads != [threading.current_thread()]
+
+
+def test_shutdown():
+    activate_request_context()
+    reader = ExtractReader([], OfficeRecord({'de': 'Test'}), max_workers=3)
+    reader.shutdown()
+    sources = _sources()
+    results = reader._read_plr_sources_(sources, MockParameter(), None, None)
+    assert results == [[('first', 1)], [('second', 2)], [('third', 3)]]
+    # The sources are read sequentially after the shutdown
+    assert sources[0][1].threads == [threading.current_thread()]
+
+
+def test_read_plr_sources_topic_timeout():
+    activate_request_context()
+    reader = ExtractReader([], OfficeRecord({'de': 'Test'}), max_workers=3, topic_timeout=0.1)
+    slow = DelayedSource('ContaminatedSites', 0.5)
+    fast = DelayedSource('LandUsePlans', 0.0)
+    results = reader._read_plr_sources_([(1, slow), (2, fast)], MockParameter(), None, None)
+    assert isinstance(results[0][0], EmptyPlrRecord)
+    assert not results[0][0].has_data
+    assert results[0][0].theme.code == 'ContaminatedSites'
+    assert results[1] == [('LandUsePlans', 2)]
+    assert reader.degraded_topics == ['ContaminatedSites']
+
+
+def test_read_plr_sources_topic_timeout_excludes_queue_time():
+    activate_request_context()
+    reader = ExtractReader([], OfficeRecord({'de': 'Test'}), max_workers=2, topic_timeout=0.3)
+    sources = [
+        (1, DelayedSource('LandUsePlans', 0.2)),
+        (2, DelayedSource('ContaminatedSites', 0.2)),
+        (3, DelayedSource('MotorwaysBuildingLines', 0.2))
+    ]
+    # The third topic waits for a free worker, it is not degraded although the extract takes longer than
+    # its time budget
+    results = reader._read_plr_sources_(sources, MockParameter(), None, None)
+    assert results[2] == [('MotorwaysBuildingLines', 3)]
+    assert reader.degraded_topics == []
+
+
+class QueryCanceled(Exception):
+    pgcode = '57014'
+
+
+class StatementTimeoutSource(PlrBaseSource):
+    def read(self, params, real_estate, bbox, position=None):
+        raise OperationalError('SELECT pg_sleep(10)', {}, QueryCanceled())
+
+
+def test_read_plr_sources_topic_timeout_sequential():
+    activate_request_context()
+    reader = ExtractReader([], OfficeRecord({'de': 'Test'}), topic_timeout=0.1)
+    slow = StatementTimeoutSource(code='ContaminatedSites')
+    fast = DelayedSource('LandUsePlans', 0.0)
+    results = reader._read_plr_sources_([(1, slow), (2, fast)], MockParameter(), None, None)
+    assert not results[0][0].has_data
+    assert results[1] == [('LandUsePlans', 2)]
+    assert reader.degraded_topics == ['ContaminatedSites']
+
+
+def test_read_plr_sources_extract_timeout_sequential():
+    activate_request_context()
+    reader = ExtractReader([], OfficeRecord({'de': 'Test'}), extract_timeout=0.1)
+    slow = DelayedSource('LandUsePlans', 0.2)
+    skipped = DelayedSource('ContaminatedSites', 0.0)
+    results = reader._read_plr_sources_([(1, slow), (2, skipped)], MockParameter(), None, None)
+    assert results[0] == [('LandUsePlans', 1)]
+    assert not results[1][0].has_data
+    assert skipped.threads == []
+    assert reader.degraded_topics == ['ContaminatedSites']
+
+
+class PrefetchingSource(DelayedSource):
+    prefetched = []
+
+    @classmethod
+    def prefetch(cls, plr_sources, real_estate, bbox):
+        cls.prefetched.append([plr_source.info.get('code') for plr_source in plr_sources])
+
+
+class FailingPrefetchSource(DelayedSource):
+    @classmethod
+    def prefetch(cls, plr_sources, real_estate, bbox):
+        raise RuntimeError('prefetch failed')
+
+
+def test_prefetch_plr_sources():
+    activate_request_context()
+    sources = [
+        (1, PrefetchingSource('first', 0.0)),
+        (2, FailingPrefetchSource('second', 0.0)),
+        (3, PrefetchingSource('third', 0.0)),
+        (4, LegacySource(code='fourth'))
+    ]
+    ExtractReader._prefetch_plr_sources_(sources, None, None)
+    assert PrefetchingSource.prefetched == [['first', 'third']]
+
+
+class NoDataSource(DelayedSource):
+    def has_data_in_municipality(self, municipality):
+        return False
+
+    def read(self, params, real_estate, bbox, position=None):
+        raise AssertionError('A topic without data in the municipality must not be read')
+
+
+def test_read_skips_topics_without_data_in_municipality():
+    activate_request_context()
+    reader = ExtractReader([NoDataSource('ContaminatedSites', 0.0)], OfficeRecord({'de': 'Test'}))
+    real_estate = RealEstateRecord(
+        u'test', u'BL', u'Laufen', 2770, 1000, MultiPolygon([Polygon([(0, 0), (4, 4), (4, 0)])])
+    )
+    municipality = MunicipalityRecord(2770, u'Laufen', True, ImageRecord(b'1'))
+    extract = reader.read(MockParameter(), real_estate, municipality)
+    assert [theme.code for theme in extract.not_concerned_theme] == ['ContaminatedSites']
+    assert extract.concerned_theme == []
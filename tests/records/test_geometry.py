@@ -8,7 +8,7 @@ from shapely.geometry import Polygon, MultiPolygon, LineString, Point, MultiPoin
 
 import pytest
 
-from pyramid_oereb.lib.records.geometry import GeometryRecord
+from pyramid_oereb.lib.records.geometry import GeometryRecord, IntersectionMeasures
 from pyramid_oereb.lib.records.law_status import LawStatusRecord
 from pyramid_oereb.lib.records.real_estate import RealEstateRecord
 
@@ -229,3 +229,43 @@ def test_calculate(geometry, real_estate_geometry, length_limit, area_limit, len
     assert geometry_record._length_share == length_share
     assert geometry_record._area_share == area_share
     assert geometry_record._nr_of_points == nr_of_points
+
+
+@pytest.mark.parametrize('measures,area_limit,length_share,area_share,nr_of_points,test', [
+    (IntersectionMeasures('Polygon', 1.5, 0, 0), 1, None, 1.5, None, True),
+    (IntersectionMeasures('Polygon', 0.5, 0, 0), 1, None, None, None, False),
+    (IntersectionMeasures('LineString', 0, 2.0, 0), 1, 2.0, None, None, True),
+    (IntersectionMeasures('LineString', 0, 0, 0), 1, None, None, None, False),
+    (IntersectionMeasures('Point', 0, 0, 1), 1, None, None, 1, True),
+    (IntersectionMeasures('Point', 0, 0, 0), 1, None, None, None, False)
+])
+def test_calculate_intersection_measures(measures, area_limit, length_share, area_share, nr_of_points,
+                                         test):
+    law_status_record = LawStatusRecord("runningModifications", {u'de': u'BlaBla'})
+    geometry_record = GeometryRecord(
+        law_status_record,
+        datetime.date(1985, 8, 29),
+        None,
+        'test',
+        intersection_measures=measures
+    )
+    assert geometry_record.geom_type == measures.geom_type
+    real_estate = RealEstateRecord(
+        'Liegenschaft',
+        'BL',
+        'Aesch BL',
+        2761,
+        1,
+        MultiPolygon([Polygon(((0, 0), (0, 1), (1, 1), (1, 0)))])
+    )
+    geometry_record.calculate(real_estate, 1, area_limit, 'm', 'm2')
+    assert geometry_record._test_passed == test
+    assert geometry_record._length_share == length_share
+    assert geometry_record._area_share == area_share
+    assert geometry_record._nr_of_points == nr_of_points
+
+
+def test_init_without_geometry():
+    law_status_record = LawStatusRecord("runningModifications", {u'de': u'BlaBla'})
+    with pytest.raises(AttributeError):
+        GeometryRecord(law_status_record, datetime.date(1985, 8, 29), None)
@@ -45,3 +45,23 @@ def test_validate_filetype_invalid():
     with pytest.raises(TypeError) as e:
         ImageRecord._validate_filetype('tests/resources/invalid.jpg')
     assert '{0}'.format(e.value).startswith('Invalid file type')
+
+
+def test_file_type_is_detected_once(monkeypatch):
+    with open('tests/resources/logo_canton.png', 'rb') as f:
+        image_record = ImageRecord(f.read())
+    calls = []
+    validate_filetype = ImageRecord._validate_filetype
+
+    def count_validate_filetype(obj):
+        calls.append(obj)
+        return validate_filetype(obj)
+
+    monkeypatch.setattr(ImageRecord, '_validate_filetype', staticmethod(count_validate_filetype))
+    assert image_record.mimetype == 'image/png'
+    assert image_record.extension == 'png'
+    assert len(calls) == 1
+    with open('tests/resources/python.svg', 'rb') as f:
+        image_record.content = f.read()
+    assert image_record.extension == 'svg'
+    assert len(calls) == 2
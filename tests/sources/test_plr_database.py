@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+import copy
+import re
+from types import SimpleNamespace
+
+import pytest
+from pyramid.config import ConfigurationError
+from shapely.geometry import box
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from pyramid_oereb.lib import b64
+from pyramid_oereb.lib.config import Config
+from pyramid_oereb.lib.context import activate_request_context
+from pyramid_oereb.lib.processor import create_processor
+from pyramid_oereb.lib.records.geometry import GeometryRecord
+from pyramid_oereb.lib.records.municipality import MunicipalityRecord
+from pyramid_oereb.lib.records.view_service import ViewServiceRecord
+from pyramid_oereb.standard.models import contaminated_sites
+from pyramid_oereb.standard.sources.plr import DatabaseSource
+from pyramid_oereb.standard.subdivide_geometries import get_subdivide_statements
+from pyramid_oereb.views.webservice import PlrWebservice
+from tests.mockrequest import MockRequest
+
+
+def get_plr_source(code, **source_params):
+    for plr in Config.get('plrs'):
+        if plr.get('code') == code:
+            plr = copy.deepcopy(plr)
+            plr.get('source').get('params').update(source_params)
+            return DatabaseSource(**plr)
+
+
+def get_params_and_real_estate():
+    request = MockRequest()
+    request.matchdict.update({
+        'flavour': 'reduced',
+        'format': 'json',
+        'param1': 'TEST'
+    })
+    params = PlrWebservice(request).__validate_extract_params__()
+    real_estate = create_processor().real_estate_reader.read(params, egrid=u'TEST')[0]
+    return params, real_estate
+
+
+@pytest.mark.run(order=2)
+@pytest.mark.parametrize('code,expected', [
+    ('ContaminatedSites', True),
+    ('NoiseSensitivityLevels', False)
+])
+def test_contains_geometries(code, expected):
+    source = get_plr_source(code)
+    session = source._adapter_.get_session(source._key_)
+    try:
+        assert source._has_geometries is expected
+        assert source._contains_geometries(session) is expected
+    finally:
+        session.close()
+
+
+@pytest.mark.run(order=2)
+def test_collect_plrs_by_bbox():
+    _, real_estate = get_params_and_real_estate()
+    bbox = box(*ViewServiceRecord.get_bbox(real_estate.limit))
+    source = get_plr_source('ContaminatedSites')
+    session = source._adapter_.get_session(source._key_)
+    try:
+        bbox_results = source.collect_plrs_by_bbox(session, real_estate, bbox)
+        related = session.query(source._model_).filter(
+            source.get_intersection_clause(real_estate.limit)
+        ).all()
+        plr_ids = [bbox_result.id for bbox_result in bbox_results]
+        assert len(plr_ids) == len(set(plr_ids))
+        assert set([
+            bbox_result.id for bbox_result in bbox_results if bbox_result.intersects_real_estate
+        ]) == set([geometry.public_law_restriction_id for geometry in related])
+
+        legend_entries = source.get_legend_entries([
+            (bbox_result.view_service_id, bbox_result.type_code) for bbox_result in bbox_results
+        ])
+        legend_entry_keys = set([
+            (legend_entry.view_service_id, legend_entry.type_code, legend_entry.symbol.content)
+            for legend_entry in legend_entries
+        ])
+        assert len(legend_entry_keys) > 0
+        visible = set([(bbox_result.view_service_id, bbox_result.type_code) for bbox_result in bbox_results])
+        assert legend_entry_keys == set([
+            (legend_entry.view_service_id, legend_entry.type_code, b64.decode(legend_entry.symbol))
+            for legend_entry in session.query(source.legend_entry_model).all()
+            if (legend_entry.view_service_id, legend_entry.type_code) in visible
+        ])
+        assert source.get_legend_entries([]) == []
+    finally:
+        session.close()
+
+
+def test_invalid_loader_strategy():
+    with pytest.raises(ConfigurationError):
+        get_plr_source('ContaminatedSites', loader_strategy='subquery')
+
+
+@pytest.mark.run(order=2)
+@pytest.mark.parametrize('loader_strategy,eager_statements', [
+    ('joined', 0),
+    ('selectin', None)
+])
+def test_read_statement_count(loader_strategy, eager_statements):
+    params, real_estate = get_params_and_real_estate()
+    source = get_plr_source('ContaminatedSites', loader_strategy=loader_strategy)
+    if eager_statements is None:
+        # At most one statement per eager loaded relationship, independent of the number of restrictions
+        eager_statements = len(source.get_loader_options(
+            source._plr_model,
+            source.get_plr_relationships()
+        ))
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = source._adapter_.get_connections().get(source._key_).get('engine')
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        records = source.read(params, real_estate, box(*ViewServiceRecord.get_bbox(real_estate.limit)))
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_statement)
+
+    assert len(records) > 0
+    # bbox query and public law restrictions, the legend entries are taken from the index
+    assert len(statements) <= 2 + eager_statements
+
+
+@pytest.mark.run(order=2)
+def test_extract_statement_count():
+    activate_request_context()
+    params, real_estate = get_params_and_real_estate()
+    processor = create_processor()
+    municipality = processor.municipality_reader.read(params, real_estate.fosnr)[0]
+    plr_sources = processor.plr_sources
+    query_statistics = plr_sources[0]._adapter_.begin_query_statistics()
+    extract = processor.extract_reader.read(params, real_estate, municipality)
+    assert len(extract.concerned_theme) > 0
+    for plr_source in plr_sources:
+        eager_statements = len(plr_source.get_loader_options(
+            plr_source._plr_model,
+            plr_source.get_plr_relationships()
+        ))
+        statistics = query_statistics.get(plr_source.info.get('code'), {'statements': 0})
+        # bbox query, public law restrictions and their eager loaded relationships, independent of the
+        # number of restrictions
+        assert statistics.get('statements') <= 2 + eager_statements
+    # Whether a topic has data in the municipality is checked at most once per topic
+    assert query_statistics.get('other', {'statements': 0}).get('statements') <= len(plr_sources)
+
+
+@pytest.mark.run(order=2)
+def test_legend_entry_index():
+    source = get_plr_source('ContaminatedSites')
+    assert len(source._legend_entries) > 0
+    for (view_service_id, type_code), legend_entries in source._legend_entries.items():
+        for legend_entry in legend_entries:
+            assert legend_entry.view_service_id == view_service_id
+            assert legend_entry.type_code == type_code
+            assert legend_entry.symbol.extension in ['png', 'svg']
+
+
+@pytest.mark.run(order=2)
+def test_prefetch():
+    activate_request_context()
+    params, real_estate = get_params_and_real_estate()
+    bbox = box(*ViewServiceRecord.get_bbox(real_estate.limit))
+    sources = [get_plr_source('ContaminatedSites'), get_plr_source('LandUsePlans')]
+    DatabaseSource.prefetch(sources, real_estate, bbox)
+    for source in sources:
+        session = source._adapter_.get_session(source._key_)
+        try:
+            expected = [
+                (bbox_result.id, bbox_result.type_code, bbox_result.view_service_id,
+                 bbox_result.intersects_real_estate)
+                for bbox_result in source.collect_plrs_by_bbox(session, real_estate, bbox)
+            ]
+        finally:
+            session.close()
+        assert len(expected) > 0
+        # The UNION ALL query delivers the same rows and types as the query of the single topic
+        assert [tuple(result) for result in source._get_prefetched_bbox_results(real_estate)] == expected
+        assert source._get_prefetched_bbox_results(None) is None
+        assert len(source.read(params, real_estate, bbox)) > 0
+
+
+@pytest.mark.run(order=2)
+@pytest.mark.parametrize('with_geometry', [True, False])
+def test_read_server_side_measures(with_geometry):
+    params, real_estate = get_params_and_real_estate()
+    params.__with_geometry__ = with_geometry
+    bbox = box(*ViewServiceRecord.get_bbox(real_estate.limit))
+    expected = get_plr_source('ContaminatedSites').read(params, real_estate, bbox)
+    records = get_plr_source('ContaminatedSites', server_side_measures=True).read(params, real_estate, bbox)
+    assert len(records) == len(expected)
+    for record, expected_record in zip(records, expected):
+        assert len(record.geometries) == len(expected_record.geometries)
+        for geometry, expected_geometry in zip(record.geometries, expected_record.geometries):
+            measures = geometry.intersection_measures
+            assert measures is not None
+            assert (geometry.geom is not None) == with_geometry
+            # The measure of the part with the dimension of the geometry is the one calculated by shapely,
+            # the source reports empty parts with 0
+            nr_of_points, length, area = expected_geometry._measure_intersection(real_estate)
+            dimension = GeometryRecord.geom_dim(expected_geometry.geom)
+            if dimension == 0:
+                assert (measures.nr_of_points or None) == nr_of_points
+            elif dimension == 1:
+                assert (measures.length or None) == (None if length is None else pytest.approx(length))
+            elif dimension == 2:
+                assert (measures.area or None) == (None if area is None else pytest.approx(area))
+        assert record.calculate(real_estate) == expected_record.calculate(real_estate)
+        assert record.area_share == expected_record.area_share
+        assert record.length_share == expected_record.length_share
+        assert record.nr_of_points == expected_record.nr_of_points
+
+
+@pytest.mark.run(order=2)
+def test_collect_plrs_by_subdivided_geometries():
+    _, real_estate = get_params_and_real_estate()
+    bbox = box(*ViewServiceRecord.get_bbox(real_estate.limit))
+    source = get_plr_source('ContaminatedSites')
+    subdivided_source = get_plr_source('ContaminatedSites', subdivide_max_vertices=8)
+    assert subdivided_source._subdivided_model is not None
+    session = subdivided_source._adapter_.get_session(subdivided_source._key_)
+    try:
+        for statement in get_subdivide_statements(contaminated_sites, 8):
+            session.execute(statement)
+        query = subdivided_source.get_bbox_query(session, real_estate, bbox)
+        assert 'subdivided_geometry' in str(query.statement.compile(dialect=postgresql.dialect()))
+        expected = source.collect_plrs_by_bbox(session, real_estate, bbox)
+        assert len(expected) > 0
+        assert subdivided_source.collect_plrs_by_bbox(session, real_estate, bbox) == expected
+    finally:
+        session.rollback()
+        session.close()
+
+
+def test_subdivided_geometries_missing_model():
+    with pytest.raises(ConfigurationError):
+        get_plr_source(
+            'ContaminatedSites',
+            models='pyramid_oereb.contrib.models.oereblex.contaminated_sites',
+            subdivide_max_vertices=8
+        )
+
+
+@pytest.mark.run(order=2)
+def test_records_are_shared_within_request():
+    activate_request_context()
+    source = get_plr_source('ContaminatedSites')
+    session = source._adapter_.get_session(source._key_)
+    try:
+        office = session.query(contaminated_sites.Office).first()
+        document = session.query(contaminated_sites.Document).first()
+        office_record = source.from_db_to_office_record(office)
+        document_record = source.from_db_to_document_records([document])[0]
+        assert source.from_db_to_office_record(office) is office_record
+        assert source.from_db_to_document_records([document])[0] is document_record
+        assert source.from_db_to_document_records([document], [['1']])[0] is not document_record
+        activate_request_context()
+        assert source.from_db_to_office_record(office) is not office_record
+    finally:
+        session.close()
+
+
+def mock_related_plr_records(monkeypatch, max_base_refinement_depth):
+    activate_request_context()
+    source = get_plr_source('ContaminatedSites', max_base_refinement_depth=max_base_refinement_depth)
+
+    def from_db_to_plr_record(params, plr, legend_entries_from_db, depth=0, resolving=frozenset()):
+        return plr.id, source.get_related_plr_records(params, plr.bases, depth + 1, resolving | {plr.id})
+
+    monkeypatch.setattr(source, 'from_db_to_plr_record', from_db_to_plr_record)
+    plrs = [SimpleNamespace(id=plr_id, view_service_id=1, type_code='test', bases=[]) for plr_id in range(5)]
+    return source, plrs
+
+
+@pytest.mark.run(order=2)
+def test_related_plr_records(monkeypatch):
+    source, (_, first, second, third, fourth) = mock_related_plr_records(monkeypatch, 3)
+    first.bases = [second]
+    second.bases = [first, third]
+    third.bases = [fourth]
+    records = source.get_related_plr_records(None, [first], 1, frozenset([0]))
+    # The cyclic base is skipped and the fourth level is beyond the depth limit
+    assert records == [(1, [(2, [(3, [])])])]
+    # Records missing a cyclic base are resolved again for other ancestors
+    records = source.get_related_plr_records(None, [second], 1, frozenset([0]))
+    assert records == [(2, [(1, []), (3, [(4, [])])])]
+    # Completely resolved records are shared on the same level
+    assert source.get_related_plr_records(None, [third], 2, frozenset([0]))[0] is records[0][1][1]
+
+
+@pytest.mark.run(order=2)
+def test_related_plr_records_at_different_depths(monkeypatch):
+    source, (_, first, second, third, fourth) = mock_related_plr_records(monkeypatch, 3)
+    # The shared base is reached on the second level first and on the third level afterwards
+    first.bases = [second, third]
+    third.bases = [second]
+    second.bases = [fourth]
+    records = source.get_related_plr_records(None, [first], 1, frozenset([0]))
+    assert records == [(1, [(2, [(4, [])]), (3, [(2, [])])])]
+    # The result does not depend on the order the base is reached in
+    first.bases = [third, second]
+    activate_request_context()
+    records = source.get_related_plr_records(None, [first], 1, frozenset([0]))
+    assert records == [(1, [(3, [(2, [])]), (2, [(4, [])])])]
+
+
+@pytest.mark.run(order=2)
+def test_has_data_in_municipality():
+    source = get_plr_source('ContaminatedSites')
+    assert source._has_geometries
+    fosnr = 9999
+    far_away = MunicipalityRecord(fosnr, u'Test', True, None, geom='POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))')
+    assert source.has_data_in_municipality(MunicipalityRecord(fosnr, u'Test', True, None)) is True
+    assert source.has_data_in_municipality(far_away) is False
+    assert source._data_by_municipality == {fosnr: False}
+    source._availability_index[fosnr] = False
+    assert not source._is_available(far_away)
+    # The topic is not available, so it has to be read to be reported without data
+    assert source.has_data_in_municipality(far_away) is True
+    source.refresh()
+    assert source._data_by_municipality == {}
+
+
+@pytest.mark.run(order=2)
+def test_refresh_after_import():
+    activate_request_context()
+    params, real_estate = get_params_and_real_estate()
+    processor = create_processor()
+    processor.data_version._version_check_interval_ = 0
+    source = [
+        plr_source for plr_source in processor.plr_sources
+        if plr_source.info.get('code') == 'ContaminatedSites'
+    ][0]
+    municipality = MunicipalityRecord(9998, u'Test', True, None,
+                                      geom='POLYGON((100 100, 101 100, 101 101, 100 101, 100 100))')
+    processor.process(real_estate, params, 'http://test.ch')
+    assert source.has_data_in_municipality(municipality) is False
+    connection = source._adapter_.get_connections().get(source._key_).get('engine').connect()
+    try:
+        with connection.begin():
+            connection.execute(contaminated_sites.DataIntegration.__table__.insert(), {
+                'id': '2',
+                'date': u'2017-08-01T00:00:00',
+                'office_id': '1'
+            })
+            connection.execute(contaminated_sites.Geometry.__table__.insert(), {
+                'id': '5',
+                'law_status': u'inForce',
+                'published_from': u'2017-08-01',
+                'public_law_restriction_id': '1',
+                'office_id': '1',
+                'geom': u'SRID=2056;GEOMETRYCOLLECTION('
+                        u'POLYGON((100 100, 100 101, 101 101, 101 100, 100 100)))'
+            })
+        # The next extract detects the import and the topic is no longer skipped in the municipality
+        processor.process(real_estate, params, 'http://test.ch')
+        assert source.has_data_in_municipality(municipality) is True
+    finally:
+        with connection.begin():
+            connection.execute(contaminated_sites.Geometry.__table__.delete().where(
+                contaminated_sites.Geometry.id == '5'
+            ))
+            connection.execute(contaminated_sites.DataIntegration.__table__.delete().where(
+                contaminated_sites.DataIntegration.id == '2'
+            ))
+        connection.close()
+
+
+def test_extract_geometry_collection_db():
+    first = box(0, 0, 1, 1)
+    second = box(2, 2, 3, 3)
+    compiled = [
+        DatabaseSource.extract_geometry_collection_db('schema.geometry.geom', geometry).compile(
+            dialect=postgresql.dialect()
+        )
+        for geometry in [first, second]
+    ]
+    assert str(compiled[0]) == str(compiled[1])
+    assert 'POLYGON' not in str(compiled[0])
+    # bounding box prefilter and the intersections of the points, lines and polygons
+    assert str(compiled[0]).count('%(geometry_1)s') == 4
+    assert compiled[0].params.get('geometry_1') == first.wkb
+    assert compiled[1].params.get('geometry_1') == second.wkb
+
+
+@pytest.mark.run(order=2)
+def test_collection_clause_uses_spatial_index():
+    _, real_estate = get_params_and_real_estate()
+    source = get_plr_source('LandUsePlans')
+    assert source.info.get('geometry_type') == 'GEOMETRYCOLLECTION'
+    session = source._adapter_.get_session(source._key_)
+    try:
+        query = source.get_bbox_query(
+            session,
+            real_estate,
+            box(*ViewServiceRecord.get_bbox(real_estate.limit))
+        )
+        statement = query.statement.compile(dialect=postgresql.dialect())
+    finally:
+        session.close()
+    table = source._model_.__table__
+    engine = source._adapter_.get_connections().get(source._key_).get('engine')
+    with engine.connect() as connection:
+        index_names = [row[0] for row in connection.execute(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = %(schema)s AND tablename = %(table)s "
+            "AND indexdef ILIKE '%%USING gist%%'",
+            {'schema': table.schema, 'table': table.name}
+        )]
+        transaction = connection.begin()
+        try:
+            # The test tables are too small for the planner to prefer the index by itself
+            connection.execute('SET LOCAL enable_seqscan = off')
+            plan = [row[0] for row in connection.execute('EXPLAIN ' + str(statement), statement.params)]
+        finally:
+            transaction.rollback()
+    assert len(index_names) == 1
+    # The bounding box prefilter (&&) is answered by the GiST index of the geometry column
+    index_scans = [
+        position for position, line in enumerate(plan)
+        if re.search(r'(Bitmap Index Scan on|Index Scan using) {0}\b'.format(re.escape(index_names[0])), line)
+    ]
+    assert len(index_scans) > 0, '\n'.join(plan)
+    index_condition = plan[index_scans[0] + 1]
+    assert 'Index Cond' in index_condition and '&&' in index_condition, '\n'.join(plan)
+    assert not any('Seq Scan on geometry' in line for line in plan), '\n'.join(plan)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+from pyramid.config import ConfigurationError
+
+from pyramid_oereb.lib.cache import DataVersion, LRUCache, VersionedCache, create_cache
+
+
+def test_lru_cache_get_set():
+    cache = LRUCache(max_size=2)
+    assert cache.get('a') is None
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert len(cache) == 2
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_lru_cache_ttl():
+    cache = LRUCache(ttl=0.01)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.02)
+    assert cache.get('a') is None
+
+
+def test_lru_cache_clear():
+    cache = LRUCache()
+    cache.set('a', 1)
+    cache.clear()
+    assert cache.get('a') is None
+
+
+def test_versioned_cache_invalidation():
+    versions = ['1']
+    cache = VersionedCache(LRUCache(), DataVersion(lambda: versions[0], version_check_interval=0))
+    key = cache.key('CH113928077734', 'reduced', 'json')
+    cache.set(key, 'extract')
+    assert cache.get(cache.key('CH113928077734', 'reduced', 'json')) == 'extract'
+    assert cache.get(cache.key('CH113928077734', 'full', 'pdf')) is None
+    versions[0] = '2'
+    assert cache.get(cache.key('CH113928077734', 'reduced', 'json')) is None
+
+
+def test_versioned_cache_unknown_version():
+    versions = [None]
+    backend = LRUCache()
+    cache = VersionedCache(backend, DataVersion(lambda: versions[0], version_check_interval=0))
+    key = cache.key('CH113928077734', 'reduced', 'json')
+    assert key is None
+    cache.set(key, 'extract')
+    assert len(backend) == 0
+    assert cache.get(key) is None
+    versions[0] = '1'
+    key = cache.key('CH113928077734', 'reduced', 'json')
+    cache.set(key, 'extract')
+    assert cache.get(key) == 'extract'
+
+
+def test_data_version_check_interval():
+    calls = []
+
+    def version_provider():
+        calls.append(1)
+        return 'version'
+
+    data_version = DataVersion(version_provider, version_check_interval=60)
+    assert data_version.value == 'version'
+    assert data_version.value == 'version'
+    assert len(calls) == 1
+
+
+def test_data_version_listeners():
+    versions = ['1']
+    changes = []
+    data_version = DataVersion(lambda: versions[0], version_check_interval=0)
+    data_version.add_listener(changes.append)
+    assert data_version.check() == '1'
+    assert changes == []
+    versions[0] = None
+    assert data_version.check() is None
+    assert changes == []
+    versions[0] = '2'
+    assert data_version.value == '2'
+    assert changes == ['2']
+    assert data_version.check() == '2'
+    assert changes == ['2']
+
+
+def test_create_cache():
+    assert create_cache(None, DataVersion(lambda: '1')) is None
+    cache = create_cache({
+        'class': 'pyramid_oereb.lib.cache.LRUCache',
+        'params': {
+            'max_size': 10
+        }
+    }, DataVersion(lambda: '1'))
+    assert isinstance(cache, VersionedCache)
+    assert isinstance(cache.backend, LRUCache)
+
+
+def test_create_redis_cache_without_package():
+    try:
+        import redis  # noqa: F401
+        pytest.skip('redis is installed')
+    except ImportError:
+        pass
+    with pytest.raises(ConfigurationError):
+        create_cache({
+            'class': 'pyramid_oereb.lib.cache.RedisCache',
+            'params': {
+                'url': 'redis://localhost:6379/0'
+            }
+        }, DataVersion(lambda: '1'))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from pyramid_oereb.lib.context import RequestContext, RequestScopedAttribute, activate_request_context, \
+    get_request_context, release_request_context
+from pyramid_oereb.lib.sources import Base
+
+
+class DummyOwner(object):
+    value = RequestScopedAttribute('value', list)
+
+
+def test_default_value():
+    activate_request_context()
+    owner = DummyOwner()
+    assert owner.value == []
+    owner.value.append(1)
+    assert owner.value == [1]
+
+
+def test_value_is_request_scoped():
+    owner = DummyOwner()
+    activate_request_context()
+    owner.value = [1]
+    activate_request_context()
+    assert owner.value == []
+
+
+def test_activate_existing_context():
+    owner = DummyOwner()
+    context = activate_request_context()
+    owner.value = [1]
+    activate_request_context()
+    activate_request_context(context)
+    assert owner.value == [1]
+    assert get_request_context() is context
+
+
+class OptionalOwner(object):
+    value = RequestScopedAttribute('value', list, optional=True)
+
+
+def test_release_request_context():
+    activate_request_context()
+    release_request_context()
+    with pytest.raises(RuntimeError):
+        get_request_context()
+    with pytest.raises(RuntimeError):
+        DummyOwner().value
+
+
+def test_optional_value_without_context():
+    release_request_context()
+    owner = OptionalOwner()
+    assert owner.value == []
+    owner.value.append(1)
+    # The value is not kept without context
+    assert owner.value == []
+    with pytest.raises(RuntimeError):
+        owner.value = [1]
+    context = activate_request_context()
+    owner.value = [1]
+    assert owner.value == [1]
+    assert isinstance(context, RequestContext)
+
+
+def test_source_records_per_thread():
+    source = Base()
+    activate_request_context()
+    source.records = ['main']
+    results = []
+
+    def read():
+        activate_request_context()
+        source.records = ['thread']
+        results.append(source.records)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join()
+    assert results == [['thread']]
+    assert source.records == ['main']
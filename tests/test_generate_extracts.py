@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+
+from pyramid_oereb.lib.processor import Processor
+from pyramid_oereb.standard.generate_extracts import CHECKPOINT_FILE, _worker, generate_extract, \
+    get_output_path, read_checkpoint, write_output
+from tests import pyramid_oereb_test_config
+
+
+def test_read_checkpoint(tmpdir):
+    output_dir = str(tmpdir)
+    assert read_checkpoint(output_dir) == set()
+    with open(os.path.join(output_dir, CHECKPOINT_FILE), 'w') as f:
+        f.write('CH1\nCH2\n\n')
+    assert read_checkpoint(output_dir) == {'CH1', 'CH2'}
+
+
+def test_get_output_path():
+    assert get_output_path('out', 'CH1', 'json') == os.path.join('out', 'CH1.json.gz')
+    assert get_output_path('out', 'CH1', 'xml') == os.path.join('out', 'CH1.xml.gz')
+    assert get_output_path('out', 'CH1', 'pdf') == os.path.join('out', 'CH1.spec.json.gz')
+
+
+def test_write_output(tmpdir):
+    path = os.path.join(str(tmpdir), 'CH1.json.gz')
+    write_output(path, u'{"extract": "ä"}')
+    with gzip.open(path, 'rb') as f:
+        assert f.read().decode('utf-8') == u'{"extract": "ä"}'
+    assert os.listdir(str(tmpdir)) == ['CH1.json.gz']
+
+
+def test_generate_extract_formats(tmpdir, monkeypatch):
+    plr_counts = dict()
+    process = Processor.process
+
+    def counting_process(self, real_estate, params, sld_url):
+        extract = process(self, real_estate, params, sld_url)
+        plr_counts[params.format] = len(extract.real_estate.public_law_restrictions)
+        return extract
+
+    monkeypatch.setattr(Processor, 'process', counting_process)
+    with pyramid_oereb_test_config() as pyramid_config:
+        pyramid_config.add_renderer('pyramid_oereb_extract_json',
+                                    'pyramid_oereb.lib.renderer.extract.json_.Renderer')
+        pyramid_config.add_renderer('pyramid_oereb_extract_xml',
+                                    'pyramid_oereb.lib.renderer.extract.xml_.Renderer')
+        monkeypatch.setitem(_worker, 'registry', pyramid_config.registry)
+        monkeypatch.setitem(_worker, 'options', {
+            'formats': ['json', 'xml'],
+            'language': 'de',
+            'base_url': 'http://example.com',
+            'with_geometry': False,
+            'output_dir': str(tmpdir)
+        })
+        assert generate_extract('TEST') == ('TEST', None)
+    # Both formats contain each public law restriction once
+    assert plr_counts['json'] > 0
+    assert plr_counts['xml'] == plr_counts['json']
+    assert sorted(os.listdir(str(tmpdir))) == ['TEST.json.gz', 'TEST.xml.gz']
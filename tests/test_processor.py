@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 import datetime
 import pytest
+from types import SimpleNamespace
 from shapely.geometry import Point
 
-from pyramid_oereb.lib.processor import Processor, create_processor
+from pyramid_oereb.lib.cache import DataVersion, LRUCache, VersionedCache
+from pyramid_oereb.lib.processor import Processor, create_processor, get_data_version, get_processor, \
+    refresh_processor
 from pyramid_oereb.lib.records.extract import ExtractRecord
 from pyramid_oereb.lib.records.geometry import GeometryRecord
 from pyramid_oereb.lib.records.image import ImageRecord
@@ -42,6 +45,20 @@ def test_properties():
     assert isinstance(processor.real_estate_reader, RealEstateReader)
 
 
+def test_get_processor_is_shared():
+    processor = get_processor()
+    assert isinstance(processor, Processor)
+    assert get_processor() is processor
+
+
+def test_refresh_processor():
+    processor = get_processor()
+    refreshed = refresh_processor()
+    assert refreshed is not processor
+    assert get_processor() is refreshed
+    assert processor.extract_reader._executor_ is None
+
+
 def test_process():
     request = MockRequest()
     request.matchdict.update(request_matchdict)
@@ -53,6 +70,74 @@ def test_process():
     assert isinstance(extract, ExtractRecord)
 
 
+def test_process_cached_extract():
+    request = MockRequest()
+    request.matchdict.update(request_matchdict)
+    processor = create_processor()
+    processor._extract_cache_ = VersionedCache(LRUCache(), DataVersion(lambda: '1'))
+    params = PlrWebservice(request).__validate_extract_params__()
+    extract = processor.process(processor.real_estate_reader.read(params, egrid=u'TEST')[0], params,
+                                'http://test.ch')
+    cached = processor.process(processor.real_estate_reader.read(params, egrid=u'TEST')[0], params,
+                               'http://test.ch')
+    # Like the rendered extracts of the response cache, cached extracts are delivered unchanged
+    assert cached.extract_identifier == extract.extract_identifier
+    assert cached.creation_date == extract.creation_date
+
+
+def test_process_cached_extract_copy():
+    request = MockRequest()
+    request.matchdict.update(request_matchdict)
+    processor = create_processor()
+    processor._extract_cache_ = VersionedCache(LRUCache(), DataVersion(lambda: '1'))
+    params = PlrWebservice(request).__validate_extract_params__()
+    extract = processor.process(processor.real_estate_reader.read(params, egrid=u'TEST')[0], params,
+                                'http://test.ch')
+    glossaries = list(extract.glossaries)
+    public_law_restrictions = list(extract.real_estate.public_law_restrictions)
+    # Changes of the delivered extracts, e.g. by a renderer, do not reach the cache
+    extract.glossaries.append('changed')
+    extract.real_estate.public_law_restrictions.append('changed')
+    cached = processor.process(processor.real_estate_reader.read(params, egrid=u'TEST')[0], params,
+                               'http://test.ch')
+    assert cached is not extract
+    assert len(cached.glossaries) == len(glossaries)
+    assert len(cached.real_estate.public_law_restrictions) == len(public_law_restrictions)
+    cached.glossaries.append('changed')
+    other = processor.process(processor.real_estate_reader.read(params, egrid=u'TEST')[0], params,
+                              'http://test.ch')
+    assert other is not cached
+    assert len(other.glossaries) == len(glossaries)
+    assert other.extract_identifier == extract.extract_identifier
+
+
+def test_data_version_replica_behind(monkeypatch):
+    from pyramid_oereb import database_adapter
+
+    def source(key, version):
+        return SimpleNamespace(_key_=key, get_data_version=lambda: version)
+
+    real_estate_reader = SimpleNamespace(source=source('primary', '1'))
+    municipality_reader = SimpleNamespace(source=source('primary', '2'))
+    plr_sources = [source('other', '3'), SimpleNamespace(get_data_version=lambda: None)]
+    behind = set()
+    checked = []
+
+    def is_replica_behind(key):
+        checked.append(key)
+        return key in behind
+
+    monkeypatch.setattr(database_adapter, 'is_replica_behind', is_replica_behind)
+    version = get_data_version(real_estate_reader, municipality_reader, plr_sources)
+    assert version is not None
+    assert sorted(checked) == ['other', 'primary']
+    behind.add('other')
+    # The extracts read from a lagging replica must not be cached under the primary's version
+    assert get_data_version(real_estate_reader, municipality_reader, plr_sources) is None
+    behind.clear()
+    assert get_data_version(real_estate_reader, municipality_reader, plr_sources) == version
+
+
 def test_process_geometry_testing():
     request = MockRequest()
     request.matchdict.update(request_matchdict)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from pyramid.events import NewRequest
+from pyramid.httpexceptions import HTTPBadRequest
+
+from tests import pyramid_oereb_test_config
+from tests.mockrequest import MockRequest
+from pyramid_oereb import database_adapter
+from pyramid_oereb.lib import context
+from pyramid_oereb.views.webservice import PlrWebservice
+
+
+def get_request(body, flavour='REDUCED', output_format='JSON', param1=None):
+    request = MockRequest()
+    request.matchdict.update({
+        'flavour': flavour,
+        'format': output_format
+    })
+    if param1:
+        request.matchdict['param1'] = param1
+    request.json_body = body
+    return request
+
+
+@pytest.mark.parametrize('body,output_format,param1', [
+    (['TEST'], 'XML', None),
+    (['TEST'], 'JSON', 'TEST'),
+    ([], 'JSON', None),
+    ({'egrid': 'TEST'}, 'JSON', None),
+    ([1, 2], 'JSON', None)
+])
+def test_bad_request(body, output_format, param1):
+    service = PlrWebservice(get_request(body, output_format=output_format, param1=param1))
+    response = service.get_extract_batch()
+    assert isinstance(response, HTTPBadRequest)
+
+
+@pytest.mark.parametrize('body', [
+    ['TEST', 'MISSINGEGRID', 'TEST'],
+    {'egrids': ['TEST', 'MISSINGEGRID']}
+])
+def test_return_json_lines(body):
+    with pyramid_oereb_test_config() as pyramid_config:
+        pyramid_config.add_renderer('pyramid_oereb_extract_json',
+                                    'pyramid_oereb.lib.renderer.extract.json_.Renderer')
+        service = PlrWebservice(get_request(body, param1='GEOMETRY'))
+        response = service.get_extract_batch()
+        assert response.content_type == 'application/x-ndjson'
+        lines = response.body.decode('utf-8').splitlines()
+
+    assert len(lines) == 2
+    extract = json.loads(lines[0]).get('GetExtractByIdResponse').get('extract')
+    assert extract.get('RealEstate').get('EGRID') == 'TEST'
+    assert json.loads(lines[1]) == {
+        'egrid': 'MISSINGEGRID',
+        'error': 'No real estate found'
+    }
+
+
+def test_generate_after_finished_request(monkeypatch):
+    released = []
+    release_sessions = database_adapter.release_sessions
+
+    def record_release(request_sessions):
+        released.append(len(request_sessions))
+        release_sessions(request_sessions)
+
+    monkeypatch.setattr(database_adapter, 'release_sessions', record_release)
+    with pyramid_oereb_test_config() as pyramid_config:
+        pyramid_config.add_renderer('pyramid_oereb_extract_json',
+                                    'pyramid_oereb.lib.renderer.extract.json_.Renderer')
+        request = get_request(['TEST', 'MISSINGEGRID'], param1='GEOMETRY')
+        event = NewRequest(request)
+        context.request_context_subscriber(event)
+        database_adapter.request_subscriber(event)
+        response = PlrWebservice(request).get_extract_batch()
+        # The body is generated by the server after the request has been finished
+        request._process_finished_callbacks()
+        assert context._local.context is None
+        del released[:]
+        lines = b''.join(response.app_iter).decode('utf-8').splitlines()
+
+    assert len(lines) == 2
+    extract = json.loads(lines[0]).get('GetExtractByIdResponse').get('extract')
+    assert extract.get('RealEstate').get('EGRID') == 'TEST'
+    # The chunk and the extract were read with shared sessions, which have been released again
+    assert len(released) == 2
+    assert all(sessions > 0 for sessions in released)
+    assert request.query_statistics.get('real_estate').get('statements') > 0
+    assert context._local.context is None
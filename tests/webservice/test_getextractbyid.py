@@ -1,12 +1,16 @@
 # -*- coding: utf-8 -*-
+import copy
 import json
 import logging
 import pytest
 from jsonschema import Draft4Validator
-from pyramid.httpexceptions import HTTPBadRequest, HTTPNoContent
+from pyramid.httpexceptions import HTTPBadRequest, HTTPNoContent, HTTPNotModified
+from webob.etag import AnyETag, ETagMatcher, NoETag
 
 from tests import pyramid_oereb_test_config, schema_json_extract
 from tests.mockrequest import MockRequest
+from pyramid_oereb.lib.cache import DataVersion, LRUCache, VersionedCache
+from pyramid_oereb.lib.processor import get_processor
 from pyramid_oereb.views.webservice import PlrWebservice
 
 log = logging.getLogger('pyramid_oereb')
@@ -236,3 +240,39 @@ def test_return_json(topics):
         assert len(extract.get('ThemeWithoutData')) == 0
         restrictions = real_estate.get('RestrictionOnLandownership')
         assert restrictions[0]['Theme']['Code'] == 'ContaminatedSites'
+
+
+def test_return_cached_response(monkeypatch):
+    processor = copy.copy(get_processor())
+    processor._response_cache_ = VersionedCache(LRUCache(), DataVersion(lambda: '1'))
+    monkeypatch.setattr('pyramid_oereb.views.webservice.get_processor', lambda: processor)
+
+    def get_extract(if_none_match, egrid='TEST'):
+        request = MockRequest()
+        request.if_none_match = if_none_match
+        request.matchdict.update({
+            'flavour': 'REDUCED',
+            'format': 'JSON',
+            'param1': 'GEOMETRY',
+            'param2': egrid
+        })
+        return PlrWebservice(request).get_extract_by_id()
+
+    with pyramid_oereb_test_config() as pyramid_config:
+        pyramid_config.add_renderer('pyramid_oereb_extract_json',
+                                    'pyramid_oereb.lib.renderer.extract.json_.Renderer')
+        response = get_extract(NoETag)
+        assert response.status_code == 200
+        assert response.etag
+
+        cached_response = get_extract(NoETag)
+        assert cached_response.status_code == 200
+        assert cached_response.etag == response.etag
+        assert cached_response.body == response.body
+
+        not_modified = get_extract(ETagMatcher([response.etag]))
+        assert isinstance(not_modified, HTTPNotModified)
+
+        assert isinstance(get_extract(AnyETag), HTTPNotModified)
+        # "*" does not match real estates which do not exist
+        assert isinstance(get_extract(AnyETag, 'MISSINGEGRID'), HTTPNoContent)
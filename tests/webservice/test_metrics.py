@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from tests import pyramid_oereb_test_config
+from tests.mockrequest import MockRequest
+from pyramid_oereb.views.webservice import Metrics
+
+
+def test_get_metrics():
+    with pyramid_oereb_test_config():
+        response = Metrics(MockRequest()).get_metrics()
+        assert response.content_type == 'application/json'
+        metrics = response.json
+        assert isinstance(metrics.get('pools'), dict)
+        assert isinstance(metrics.get('queries'), dict)